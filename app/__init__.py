@@ -1,47 +1,128 @@
-from flask import Flask, request, redirect, url_for, jsonify
+from flask import Flask, request, jsonify
 from werkzeug.utils import secure_filename
-from app.controllers.email_controller import EmailController
-from app.views.email_view import EmailView
 import os
+import uuid
+import threading
 
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'app/uploads'
-app.config['ALLOWED_EXTENSIONS'] = {'pdf'}
-
-controller = EmailController()
-view = EmailView()
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
-
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    if request.method == 'POST':
-        name = request.form['name']
-        email = request.form['email']
-        if 'resume_file' not in request.files:
-            return "No file part"
-        file = request.files['resume_file']
-        if file.filename == '':
-            return "No selected file"
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            user_profile = controller.save_user_profile(name, email, file_path)
-            processed_emails = controller.process_emails(user_profile)
-            return view.render_dashboard(processed_emails, user_profile)
-    return view.render_profile_form()
-
-@app.route('/download/<filename>')
-def download_resume(filename):
-    return view.download_resume(filename)
-
-@app.route('/send_emails', methods=['POST'])
-def send_emails():
-    approved_email_ids = request.json.get('approved_emails', [])
-    success = controller.send_approved_emails(approved_email_ids)
-    return view.render_email_sent(success)
+def create_app():
+    """
+    Build the Flask app with its controller and job queue. Importing the package has no side effects, so
+    PDF and resume worker processes, which import it on start, do not set up a server of their own.
+    """
+    from app.controllers.email_controller import EmailController
+    from app.views.email_view import EmailView
+    from app.services.job_queue import JobQueue
+    from app.services.client_registry import get_client_registry
+    from app.services.prompt_compactor import get_prompt_metrics, load_encoding
+    from app.services.stream_hub import get_stream_hub
+    from app.services.llm_cache import get_llm_cache
+    from app.services.metrics import get_metrics
+
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = 'app/uploads'
+    app.config['ALLOWED_EXTENSIONS'] = {'pdf'}
+
+    controller = EmailController()
+    view = EmailView()
+    jobs = JobQueue(controller.run_job)
+    jobs.start()
+    app.extensions['email_controller'] = controller
+    app.extensions['job_queue'] = jobs
+    # Load the Gmail discovery document, OAuth token and tokenizer before the first request needs them
+    threading.Thread(target=get_client_registry().warm, daemon=True).start()
+    threading.Thread(target=load_encoding, daemon=True).start()
+
+    metrics = get_metrics()
+    metrics.register_collector(get_llm_cache().collect)
+    metrics.register_collector(controller.gmail_service.classifier.collect)
+    metrics.register_collector(get_prompt_metrics().collect)
+
+    def allowed_file(filename):
+        return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+
+    @app.route('/', methods=['GET', 'POST'])
+    def index():
+        if request.method == 'POST':
+            name = request.form['name']
+            email = request.form['email']
+            if 'resume_file' not in request.files:
+                return "No file part"
+            file = request.files['resume_file']
+            if file.filename == '':
+                return "No selected file"
+            if file and allowed_file(file.filename):
+                # Queued jobs read the upload later, so two files with the same name must not overwrite each other
+                filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                file.save(file_path)
+                # Processing runs in the background; the dashboard streams results as they finish
+                job_id = jobs.enqueue({
+                    'name': name,
+                    'email': email,
+                    'resume_path': file_path,
+                    'use_batch_api': request.form.get('use_batch_api') == 'on'
+                })
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify({'job_id': job_id}), 202
+                return view.render_job_dashboard(job_id, name)
+        return view.render_profile_form()
+
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        job = jobs.get_job(job_id, since=request.args.get('since', 0, type=int))
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        return view.render_job(job)
+
+    @app.route('/jobs/<job_id>/trace')
+    def job_trace(job_id):
+        trace = metrics.get_trace(job_id)
+        if trace is None:
+            return jsonify({"error": "No trace for this job; set PIPELINE_TRACING=1 to record them"}), 404
+        return view.render_trace(trace)
+
+    @app.route('/jobs/<job_id>/events')
+    def job_events(job_id):
+        return view.stream_job(jobs.follow(job_id))
+
+    @app.route('/emails')
+    def list_emails():
+        # Out-of-range values would reach the page count and the LIMIT clause
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+        filters = {'status': request.args.get('status'), 'sender': request.args.get('sender')}
+        processed_emails, total = controller.list_processed_emails(page=page, per_page=per_page, **filters)
+        if request.accept_mimetypes.best == 'application/json':
+            return view.render_email_page_json(processed_emails, total, page, per_page)
+        return view.render_email_page(processed_emails, total, page, per_page, filters)
+
+    @app.route('/streams/<stream_id>')
+    def email_stream(stream_id):
+        hub = get_stream_hub()
+        # Streams only exist in the process running the job; the dashboard then waits for the final result
+        if not hub.exists(stream_id):
+            return jsonify({"error": "Unknown stream"}), 404
+        return view.stream_job(hub.follow(stream_id))
+
+    @app.route('/stats')
+    def stats():
+        return jsonify({'prompt_tokens': get_prompt_metrics().snapshot()})
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return view.render_metrics(metrics.render())
+
+    @app.route('/download/<filename>')
+    def download_resume(filename):
+        return view.download_resume(filename)
+
+    @app.route('/send_emails', methods=['POST'])
+    def send_emails():
+        approved_email_ids = request.json.get('approved_emails', [])
+        results = controller.send_approved_emails(approved_email_ids)
+        return view.render_email_sent(results)
+
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -1,38 +1,235 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from app.services.gmail_service import GmailService
 from app.services.openai_service import OpenAIService
-from app.models.email_model import UserProfile, ProcessedEmail
-from PyPDF2 import PdfReader
+from app.services.llm_cache import get_llm_cache, resume_tag
+from app.services.email_store import EmailStore
+from app.services.resume_service import ResumeService
+from app.services.skill_matcher import get_skill_index
+from app.services.batch_service import BatchTailoringService
+from app.services.stream_hub import get_stream_hub
+from app.services.metrics import get_metrics, span, timed, profiled
+from app.services.request_scheduler import get_scheduler, PRIORITY_BULK
+from app.models.email_model import ProcessedEmail
+
+# Maximum number of recruiter emails processed at the same time
+MAX_WORKERS = int(os.getenv("EMAIL_PROCESSING_WORKERS", "4"))
+# Sync only mail added since the last run instead of re-scanning the inbox
+INCREMENTAL_SYNC = os.getenv("INCREMENTAL_SYNC", "1") == "1"
+# Stream resumes and responses to the dashboard token by token as they are generated
+STREAM_LLM_OUTPUT = os.getenv("STREAM_LLM_OUTPUT", "1") == "1"
+# Recruiter messages listed per scan of the inbox
+MAX_EMAILS = int(os.getenv("MAX_EMAILS", "11"))
 
 class EmailController:
-    def __init__(self):
+    def __init__(self, max_workers=MAX_WORKERS, incremental_sync=INCREMENTAL_SYNC, stream_output=STREAM_LLM_OUTPUT,
+                 max_emails=MAX_EMAILS):
         self.gmail_service = GmailService()
         self.openai_service = OpenAIService()
+        self.resume_service = ResumeService()
+        self.batch_service = BatchTailoringService(self.gmail_service)
+        self.max_workers = max_workers
+        self.incremental_sync = incremental_sync
+        # Processed emails and their send status are kept here in both sync modes
+        self.email_store = EmailStore()
+        self.stream_output = stream_output
+        self.streams = get_stream_hub()
+        self.max_emails = max_emails
+
+    def process_emails(self, user_profile, on_result=None, use_batch_api=False, on_stream=None):
+        """
+        Process recruiter emails in inbox order; on_result, if given, receives each ProcessedEmail as it
+        finishes. With incremental sync only the stored emails not yet tailored to this resume are processed.
+        use_batch_api sends the tailoring work through the OpenAI Batch API instead. on_stream, if given,
+        receives (email, stream_id, skill_match) when generation for an email starts; its partial output can
+        be followed through the StreamHub.
+        """
+        tag = resume_tag(user_profile.resume_content)
+
+        def on_processed(processed_email):
+            self.email_store.save_processed(processed_email, tag)
+            if on_result:
+                on_result(processed_email)
+
+        if not self.incremental_sync:
+            with span('sync'):
+                recruiter_emails = self.gmail_service.get_recruiter_emails(max_results=self.max_emails)
+            for email in recruiter_emails:
+                self.email_store.save_email(email, None)
+            skill_matches = self.match_skills(recruiter_emails, user_profile)
+            return self.process_batch(recruiter_emails, user_profile, on_processed, skill_matches, use_batch_api,
+                                      on_stream)
+
+        # New mail is saved to the store by the sync. Emails already tailored to this resume are not loaded:
+        # earlier jobs published them and /emails lists them
+        with span('sync'):
+            self.gmail_service.sync_recruiter_emails(self.email_store, max_results=self.max_emails)
+        pending = self.email_store.load_pending(tag)
+        skill_matches = self.match_skills(pending, user_profile)
+        return self.process_batch(pending, user_profile, on_processed, skill_matches, use_batch_api, on_stream)
+
+    def process_batch(self, recruiter_emails, user_profile, on_result=None, skill_matches=None, use_batch_api=False,
+                      on_stream=None):
+        if not recruiter_emails:
+            return []
+        skill_matches = skill_matches or {}
+
+        if use_batch_api:
+            return self.report_batch(self.batch_service.run(recruiter_emails, user_profile), skill_matches, on_result)
+
+        # Fan the resume and response work out across emails, reporting each one as it completes
+        workers = max(1, min(self.max_workers, len(recruiter_emails)))
+        # Worker threads keep the caller's trace and request priority
+        process_email = get_metrics().in_context(self.process_email)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(process_email, email, user_profile, skill_matches.get(email.message_id), on_stream)
+                for email in recruiter_emails
+            ]
+            for future in as_completed(futures):
+                if on_result and future.result():
+                    on_result(future.result())
+
+        # Results are returned in inbox order regardless of completion order
+        return [future.result() for future in futures if future.result()]
+
+    def resume_batch(self, checkpoint, user_profile, on_result=None):
+        """
+        Collect a Batch API run submitted by an earlier attempt of the job, from the checkpoint it deferred
+        with; the inbox is not synced again and nothing is resubmitted.
+        """
+        tag = resume_tag(user_profile.resume_content)
 
-    def process_emails(self, user_profile):
-        recruiter_emails = self.gmail_service.get_recruiter_emails()
-        processed_emails = []
+        def on_processed(processed_email):
+            self.email_store.save_processed(processed_email, tag)
+            if on_result:
+                on_result(processed_email)
 
-        for email in recruiter_emails:
-            tailored_resume = self.openai_service.generate_tailored_resume(email, user_profile)
-            if tailored_resume:
-                response_email = self.gmail_service.compose_response_email(email, user_profile, tailored_resume)
-                processed_emails.append(ProcessedEmail(email, tailored_resume, response_email))
+        emails = self.email_store.get_emails(checkpoint['message_ids'])
+        skill_matches = self.match_skills(emails, user_profile)
+        processed_emails = self.batch_service.resume(checkpoint['batch_id'], emails, user_profile)
+        return self.report_batch(processed_emails, skill_matches, on_processed)
 
+    @staticmethod
+    def report_batch(processed_emails, skill_matches, on_result=None):
+        processed_emails = [
+            processed_email.with_skill_match(skill_matches.get(processed_email.original_email.message_id))
+            for processed_email in processed_emails
+        ]
+        for processed_email in processed_emails:
+            if on_result:
+                on_result(processed_email)
         return processed_emails
 
+    @timed('process_email')
+    def process_email(self, email, user_profile, skill_match=None, on_stream=None):
+        """Tailor a resume and compose a response for a single email; failures only drop this email."""
+        stream_id = None
+        if on_stream:
+            stream_id = self.streams.create()
+            on_stream(email, stream_id, skill_match)
+
+        def on_delta(event):
+            if stream_id is None:
+                return None
+            return lambda text: self.streams.publish(stream_id, event, {'text': text})
+
+        processed_email = None
+        try:
+            tailored_resume = self.openai_service.generate_tailored_resume(email, user_profile, on_delta('resume'))
+            if not tailored_resume:
+                return None
+            response_email = self.gmail_service.compose_response_email(
+                email, user_profile, tailored_resume, on_delta('response')
+            )
+            processed_email = ProcessedEmail(email, tailored_resume, response_email, skill_match)
+            return processed_email
+        except Exception as e:
+            logging.error(f"Error processing email {email.message_id}: {e}")
+            return None
+        finally:
+            if stream_id:
+                self.streams.close(stream_id, 'done' if processed_email else 'failed')
+
+    @timed('match_skills')
+    def match_skills(self, recruiter_emails, user_profile):
+        """Score every email's required skills against the user's resume in one pass; keyed by message ID."""
+        index = get_skill_index(user_profile.resume_content)
+        matches = index.match_many([email.required_skills for email in recruiter_emails])
+        return {email.message_id: match for email, match in zip(recruiter_emails, matches)}
+
+    @profiled('run_job')
+    def run_job(self, payload, publish):
+        """
+        JobQueue handler: build the profile from the upload and publish each ProcessedEmail as it finishes.
+        A job deferred while its Batch API run is in progress comes back with that batch in payload['checkpoint'].
+        """
+        user_profile = self.save_user_profile(payload['name'], payload['email'], payload['resume_path'])
+        use_batch_api = payload.get('use_batch_api', False)
+
+        def publish_result(processed_email):
+            publish(processed_email.to_dict())
+
+        def on_stream(email, stream_id, skill_match):
+            # Placeholder for the dashboard card, filled from the stream until the final result replaces it;
+            # a 'stream' event rather than a result, so pollers only see each email once
+            placeholder = ProcessedEmail(email, None, None, skill_match).to_dict()
+            placeholder['stream_id'] = stream_id
+            publish(placeholder, 'stream')
+
+        # Background work waits behind interactive calls such as sending approved emails
+        with get_scheduler().priority(PRIORITY_BULK):
+            if payload.get('checkpoint'):
+                self.resume_batch(payload['checkpoint'], user_profile, on_result=publish_result)
+                return
+            self.process_emails(
+                user_profile,
+                on_result=publish_result,
+                use_batch_api=use_batch_api,
+                on_stream=on_stream if self.stream_output and not use_batch_api else None
+            )
+
     def save_user_profile(self, name, email, resume_file):
-        resume_content = self.extract_text_from_pdf(resume_file)
-        return UserProfile(name, email, resume_content)
+        # Re-uploading the same PDF reloads the parsed profile instead of extracting it again
+        user_profile = self.resume_service.load_profile(name, email, resume_file)
+        # Cached resumes and responses tailored to an older resume are stale now
+        get_llm_cache().track_resume(user_profile.resume_content)
+        return user_profile
 
     def extract_text_from_pdf(self, pdf_file):
-        reader = PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
+        return self.resume_service.extract_text(pdf_file)
 
     def send_approved_emails(self, approved_email_ids):
+        """
+        Send the responses for the approved message IDs concurrently. Returns {message_id: error}, where
+        error is None for every response that was sent.
+        """
+        results = {}
+        claimed = []
         for email_id in approved_email_ids:
-            processed_email = next((pe for pe in self.processed_emails if pe.original_email.message_id == email_id), None)
+            # Claiming first keeps two workers from sending the same reply
+            processed_email = self.email_store.claim_for_sending(email_id)
             if processed_email:
-                self.gmail_service.send_email(processed_email.response_email)
+                claimed.append(processed_email)
+            else:
+                results[email_id] = "Not processed, already sent or being sent"
+
+        finished = 0
+        try:
+            with span('send'):
+                errors = self.gmail_service.send_emails([processed_email.response_email for processed_email in claimed])
+            for processed_email, error in zip(claimed, errors):
+                self.email_store.finish_sending(processed_email, error is None)
+                results[processed_email.original_email.message_id] = error
+                finished += 1
+        finally:
+            # Claims the send never reported on go back to 'processed' instead of staying 'sending'
+            for processed_email in claimed[finished:]:
+                self.email_store.finish_sending(processed_email, False)
+        return results
+
+    def list_processed_emails(self, status=None, sender=None, page=1, per_page=50):
+        """One page of stored ProcessedEmails for the dashboard, with the total number of matches."""
+        page = max(1, page)
+        return self.email_store.list_processed(status, sender, limit=per_page, offset=(page - 1) * per_page)
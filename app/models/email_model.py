@@ -1,37 +1,198 @@
-class Email:
-    def __init__(self, message_id, subject, sender, body, job_description, company_info, key_requirements, required_skills):
-        self.message_id = message_id
-        self.subject = subject
-        self.sender = sender
-        self.body = body
-        self.job_description = job_description
-        self.company_info = company_info
-        self.key_requirements = key_requirements
-        self.required_skills = required_skills
-
-class Resume:
+import base64
+import markdown2
+
+class Model:
+    """
+    Base for the compact, immutable models below: attributes live in __slots__ and are set once in
+    __init__. Derived text (decoded bodies, rendered HTML) is computed on first access and cached.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __reduce__(self):
+        # Slotted, immutable objects cannot be restored attribute by attribute
+        return self.from_dict, (self.to_dict(),)
+
+def decode_body(data):
+    """Text of a base64url-encoded Gmail body part."""
+    return base64.urlsafe_b64decode(data).decode() if data else ""
+
+class Email(Model):
+    # Fields extracted from the email body by the LLM, as JSON schema properties
+    EXTRACTED_FIELDS = {
+        'job_description': {'type': 'string', 'description': 'A concise summary of the job description.'},
+        'company_info': {'type': 'string', 'description': 'A concise summary of the company information.'},
+        'key_requirements': {'type': 'array', 'items': {'type': 'string'}},
+        'required_skills': {'type': 'array', 'items': {'type': 'string'}}
+    }
+
+    __slots__ = ('message_id', 'subject', 'sender', 'job_description', 'company_info', 'key_requirements',
+                 'required_skills', '_raw_body', '_body')
+
+    def __init__(self, message_id, subject, sender, body=None, job_description='', company_info='',
+                 key_requirements=(), required_skills=(), raw_body=None):
+        """Pass either the decoded body or raw_body, the base64url data of the Gmail text/plain part."""
+        self._set(
+            message_id=message_id,
+            subject=subject,
+            sender=sender,
+            job_description=job_description,
+            company_info=company_info,
+            key_requirements=tuple(key_requirements),
+            required_skills=tuple(required_skills),
+            _raw_body=raw_body,
+            _body=body
+        )
+
+    @property
+    def body(self):
+        if self._body is None:
+            self._set(_body=decode_body(self._raw_body), _raw_body=None)
+        return self._body
+
+    def to_dict(self):
+        # Nothing downstream reads the body, so job results and API responses leave it out; see to_record()
+        return {
+            'message_id': self.message_id,
+            'subject': self.subject,
+            'sender': self.sender,
+            'job_description': self.job_description,
+            'company_info': self.company_info,
+            'key_requirements': list(self.key_requirements),
+            'required_skills': list(self.required_skills)
+        }
+
+    def to_record(self):
+        """to_dict() plus the body as base64url data, the way Gmail sent it, for the EmailStore."""
+        raw_body = self._raw_body
+        if raw_body is None and self._body:
+            raw_body = base64.urlsafe_b64encode(self._body.encode()).decode('ascii')
+        return dict(self.to_dict(), raw_body=raw_body)
+
+    def __reduce__(self):
+        return self.from_dict, (self.to_record(),)
+
+    @classmethod
+    def from_dict(cls, data):
+        # Records stored before to_record() carry the decoded 'body' instead of 'raw_body'
+        return cls(**data)
+
+class Resume(Model):
+    __slots__ = ('content', 'matched_skills', 'pdf_filename', '_html_content')
+
     def __init__(self, content, html_content, matched_skills, pdf_filename):
-        self.content = content
-        self.html_content = html_content
-        self.matched_skills = matched_skills
-        self.pdf_filename = pdf_filename
+        """html_content may be None; it is then rendered from the Markdown content when first needed."""
+        self._set(
+            content=content,
+            matched_skills=tuple(matched_skills),
+            pdf_filename=pdf_filename,
+            _html_content=html_content
+        )
+
+    @property
+    def html_content(self):
+        """HTML rendering of the Markdown content, produced on first use."""
+        if self._html_content is None:
+            self._set(_html_content=markdown2.markdown(self.content))
+        return self._html_content
+
+    def to_dict(self):
+        # The HTML is derived from content, so it is not stored
+        return {
+            'content': self.content,
+            'matched_skills': list(self.matched_skills),
+            'pdf_filename': self.pdf_filename
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Records written before the HTML was dropped still carry an html_content copy
+        return cls(data['content'], None, data.get('matched_skills', []), data.get('pdf_filename'))
 
 class UserProfile:
-    def __init__(self, name, email, resume_content):
+    def __init__(self, name, email, resume_content, sections=None, skills=None, resume_hash=None, digest=None):
         self.name = name
         self.email = email
         self.resume_content = resume_content
+        # Resume split by heading and the skills listed in it, see ResumeService
+        self.sections = sections or {}
+        self.skills = skills or []
+        self.resume_hash = resume_hash
+        # Token-budgeted resume text used in prompts, see PromptCompactor
+        self.digest = digest
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'email': self.email,
+            'resume_content': self.resume_content,
+            'sections': self.sections,
+            'skills': self.skills,
+            'resume_hash': self.resume_hash,
+            'digest': self.digest
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+class ResponseEmail(Model):
+    __slots__ = ('to', 'subject', 'body', 'resume_pdf_path', 'sent')
+
+    def __init__(self, to, subject, body, resume_pdf_path, sent=False):
+        self._set(to=to, subject=subject, body=body, resume_pdf_path=resume_pdf_path, sent=sent)
+
+    def to_dict(self):
+        return {
+            'to': self.to,
+            'subject': self.subject,
+            'body': self.body,
+            'resume_pdf_path': self.resume_pdf_path,
+            'sent': self.sent
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['to'], data['subject'], data['body'], data['resume_pdf_path'], data.get('sent', False))
+
+class ProcessedEmail(Model):
+    __slots__ = ('original_email', 'tailored_resume', 'response_email', 'skill_match')
+
+    def __init__(self, original_email, tailored_resume, response_email, skill_match=None):
+        # skill_match: required skills found in the user's own resume, see SkillIndex.match_many
+        self._set(original_email=original_email, tailored_resume=tailored_resume, response_email=response_email,
+                  skill_match=skill_match)
+
+    def with_skill_match(self, skill_match):
+        return ProcessedEmail(self.original_email, self.tailored_resume, self.response_email, skill_match)
+
+    @property
+    def fit_score(self):
+        return self.skill_match['score'] if self.skill_match else 0.0
+
+    def to_dict(self):
+        return {
+            'original_email': self.original_email.to_dict(),
+            'tailored_resume': self.tailored_resume.to_dict() if self.tailored_resume else None,
+            'response_email': self.response_email.to_dict() if self.response_email else None,
+            'skill_match': self.skill_match,
+            'fit_score': self.fit_score
+        }
 
-class ResponseEmail:
-    def __init__(self, to, subject, body, resume_pdf_path):
-        self.to = to
-        self.subject = subject
-        self.body = body
-        self.resume_pdf_path = resume_pdf_path
-        self.sent = False
-
-class ProcessedEmail:
-    def __init__(self, original_email, tailored_resume, response_email):
-        self.original_email = original_email
-        self.tailored_resume = tailored_resume
-        self.response_email = response_email
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            Email.from_dict(data['original_email']),
+            Resume.from_dict(data['tailored_resume']) if data.get('tailored_resume') else None,
+            ResponseEmail.from_dict(data['response_email']) if data.get('response_email') else None,
+            data.get('skill_match')
+        )
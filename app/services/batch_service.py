@@ -0,0 +1,186 @@
+import os
+import json
+import uuid
+import logging
+from app.services import openai_service
+from app.services.openai_service import OpenAIService, RESUME_MODEL, RESUME_SYSTEM_PROMPT
+from app.services.gmail_service import RESPONSE_MODEL, RESPONSE_SYSTEM_PROMPT
+from app.services.pdf_service import get_pdf_renderer
+from app.services.request_scheduler import get_scheduler, record_usage, PRIORITY_BULK
+from app.services.metrics import span
+from app.services.job_queue import JobDeferred
+from app.services.prompt_compactor import PromptCompactor
+from app.services.llm_cache import get_llm_cache
+from app.models.email_model import ProcessedEmail
+
+BATCH_DIR = os.path.join('app', 'data', 'batches')
+# Seconds between status checks while a batch is running; the job gives up its worker in between
+BATCH_POLL_INTERVAL = int(os.getenv("BATCH_POLL_INTERVAL", "60"))
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+class BatchTailoringService:
+    """
+    Offline alternative to per-email chat completions: every resume and response prompt for a backlog
+    goes into one JSONL file submitted through the OpenAI Batch API (half price, separate rate limits).
+    Point OPENAI_BASE_URL at tools/mock_openai_server.py to run it without the real API.
+    """
+
+    def __init__(self, gmail_service, client=None, batch_dir=BATCH_DIR, poll_interval=BATCH_POLL_INTERVAL):
+        self.gmail_service = gmail_service
+        self.client = client or openai_service.client
+        self.batch_dir = batch_dir
+        self.poll_interval = poll_interval
+        self.scheduler = get_scheduler()
+        os.makedirs(batch_dir, exist_ok=True)
+
+    def run(self, emails, user_profile):
+        """
+        Tailor resumes and compose responses for all emails through one batch; returns ProcessedEmails in order.
+        Raises JobDeferred while the batch is running, with the batch ID to pass to resume on the next run.
+        """
+        if not emails:
+            return []
+        # Backlog work yields to interactive calls competing for the same limits
+        with self.scheduler.priority(PRIORITY_BULK):
+            cached = self.cached_outputs(emails, user_profile)
+            requests = self.build_requests(emails, user_profile, cached)
+            if not requests:
+                return self.collect(None, emails, user_profile, cached)
+            batch_id = self.submit(requests)
+        return self.resume(batch_id, emails, user_profile)
+
+    def resume(self, batch_id, emails, user_profile):
+        """Check a submitted batch once; collect its results if it has finished, otherwise raise JobDeferred."""
+        with self.scheduler.priority(PRIORITY_BULK):
+            batch = self.scheduler.call('openai-batches', self.client.batches.retrieve, batch_id)
+            if batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+                raise JobDeferred(self.poll_interval, {
+                    'batch_id': batch_id,
+                    'message_ids': [email.message_id for email in emails]
+                })
+            if batch.status != 'completed':
+                logging.error(f"Batch {batch.id} ended with status {batch.status}")
+                return []
+            return self.collect(batch, emails, user_profile, self.cached_outputs(emails, user_profile))
+
+    def cached_outputs(self, emails, user_profile):
+        """Map custom_id to the text already in the LLM cache, for the prompts that need no new completion."""
+        cache = get_llm_cache()
+        cached = {}
+        for email in emails:
+            resume_prompt = OpenAIService.build_resume_prompt(email, user_profile)
+            resume = cache.get(OpenAIService.resume_cache_key(email, resume_prompt))
+            if resume is not None:
+                cached[f"resume:{email.message_id}"] = resume['content']
+            response_body = cache.get(self.gmail_service.response_cache_key(
+                email, self.gmail_service.build_response_prompt(email, user_profile)
+            ))
+            if response_body is not None:
+                cached[f"response:{email.message_id}"] = response_body
+        return cached
+
+    def build_requests(self, emails, user_profile, cached=None):
+        cached = cached or {}
+        requests = []
+        for email in emails:
+            if f"resume:{email.message_id}" not in cached:
+                requests.append(self._request(
+                    f"resume:{email.message_id}", RESUME_MODEL, RESUME_SYSTEM_PROMPT,
+                    OpenAIService.build_resume_prompt(email, user_profile)
+                ))
+            if f"response:{email.message_id}" not in cached:
+                requests.append(self._request(
+                    f"response:{email.message_id}", RESPONSE_MODEL, RESPONSE_SYSTEM_PROMPT,
+                    self.gmail_service.build_response_prompt(email, user_profile)
+                ))
+        return requests
+
+    def submit(self, requests):
+        """Write the requests to a JSONL file, upload it and start the batch. Returns the batch ID."""
+        path = os.path.join(self.batch_dir, f"batch_{uuid.uuid4().hex}.jsonl")
+        with open(path, 'w', encoding='utf-8') as batch_file:
+            for request in requests:
+                batch_file.write(json.dumps(request) + "\n")
+
+        with open(path, 'rb') as batch_file:
+            input_file = self.scheduler.call('openai-files', self.client.files.create, file=batch_file, purpose="batch")
+        batch = self.scheduler.call(
+            'openai-batches',
+            self.client.batches.create,
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+            idempotent=False
+        )
+        logging.info(f"Submitted batch {batch.id} with {len(requests)} requests from {path}")
+        return batch.id
+
+    def collect(self, batch, emails, user_profile, cached=None):
+        """
+        Fan the batch output, plus the cached texts that were left out of it, back into Resume/ResponseEmail
+        objects, rendering all PDFs in parallel. batch is None when everything was cached.
+        """
+        outputs = dict(cached or {})
+        if batch is not None:
+            outputs.update(self.read_outputs(batch.output_file_id))
+
+        ready = []
+        for email in emails:
+            resume_content = outputs.get(f"resume:{email.message_id}")
+            response_body = outputs.get(f"response:{email.message_id}")
+            if resume_content is None or response_body is None:
+                logging.error(f"Batch {batch.id} has no complete result for email {email.message_id}")
+                continue
+            ready.append((email, resume_content, response_body))
+
+        with span('render_pdf'):
+            pdf_filenames = get_pdf_renderer().render_batch([
+                (OpenAIService.html_for(resume_content), user_profile.name) for _, resume_content, _ in ready
+            ])
+
+        processed_emails = []
+        for (email, resume_content, response_body), pdf_filename in zip(ready, pdf_filenames):
+            if not pdf_filename:
+                continue
+            prompt = OpenAIService.build_resume_prompt(email, user_profile)
+            resume = OpenAIService.build_resume(email, user_profile, resume_content, prompt, pdf_filename)
+            response_email = self.gmail_service.build_response_email(
+                email, user_profile, resume, response_body, self.gmail_service.build_response_prompt(email, user_profile)
+            )
+            processed_emails.append(ProcessedEmail(email, resume, response_email))
+        return processed_emails
+
+    def read_outputs(self, output_file_id):
+        """Map custom_id to completion text for every successful request in the batch output."""
+        outputs = {}
+        if not output_file_id:
+            return outputs
+        content = self.scheduler.call('openai-files', self.client.files.content, output_file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get('response') or {}
+            if result.get('error') or response.get('status_code') != 200:
+                logging.error(f"Batch request {result.get('custom_id')} failed: {result.get('error') or response}")
+                continue
+            record_usage(response['body'].get('model', 'batch'), response['body'].get('usage'))
+            outputs[result['custom_id']] = response['body']['choices'][0]['message']['content'].strip()
+        return outputs
+
+    @staticmethod
+    def _request(custom_id, model, system_prompt, prompt):
+        PromptCompactor.record(custom_id.split(':')[0] + "_batch", prompt)
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ]
+            }
+        }
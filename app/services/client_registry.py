@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import logging
+import datetime
+import threading
+import httplib2
+import requests
+import google_auth_httplib2
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from openai import OpenAI, DefaultHttpxClient
+import httpx
+
+# Gmail scopes, including send capability
+SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.send']
+TOKEN_PATH = 'token.json'
+CREDENTIALS_PATH = 'credentials.json'
+DISCOVERY_CACHE_PATH = os.getenv("GMAIL_DISCOVERY_CACHE", os.path.join('app', 'cache', 'gmail.v1.json'))
+DISCOVERY_URL = "https://gmail.googleapis.com/$discovery/rest?version=v1"
+# Connections kept open to the OpenAI API, shared by every worker thread
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+# Seconds before expiry at which the OAuth access token is refreshed in the background
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+# Wait before retrying a failed background refresh
+TOKEN_REFRESH_RETRY = 60
+
+class ClientRegistry:
+    """
+    Builds each API client once per process. The OpenAI client shares one pooled httpx transport across
+    threads; Gmail handles are per thread because httplib2 connections are not thread-safe, but they share
+    one parsed discovery document and one set of OAuth credentials that are refreshed before they expire.
+    """
+
+    def __init__(self, scopes=SCOPES, token_path=TOKEN_PATH, credentials_path=CREDENTIALS_PATH,
+                 discovery_cache_path=DISCOVERY_CACHE_PATH):
+        self.scopes = scopes
+        self.token_path = token_path
+        self.credentials_path = credentials_path
+        self.discovery_cache_path = discovery_cache_path
+        self._openai = None
+        self._creds = None
+        self._discovery = None
+        self._refresher = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Separate so an interactive sign-in or token refresh does not hold up the OpenAI client
+        self._auth_lock = threading.Lock()
+        # Pooled session used for token refreshes and the discovery download
+        self._session = requests.Session()
+
+    def openai(self):
+        with self._lock:
+            if self._openai is None:
+                # Retries are handled by the shared RequestScheduler rather than the SDK
+                self._openai = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    max_retries=0,
+                    http_client=DefaultHttpxClient(
+                        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+                        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10.0)
+                    )
+                )
+            return self._openai
+
+    def gmail(self):
+        """Gmail service handle for the calling thread, or None if it could not be built."""
+        service = getattr(self._local, 'gmail', None)
+        if service is None:
+            try:
+                http = google_auth_httplib2.AuthorizedHttp(self.credentials(), http=httplib2.Http(timeout=HTTP_TIMEOUT))
+                service = build_from_document(self.discovery_document(), http=http)
+            except HttpError as error:
+                logging.error(f'An error occurred: {error}')
+                return None
+            self._local.gmail = service
+        return service
+
+    def gmail_for(self, http):
+        """Gmail service over an explicit httplib2-compatible transport, e.g. HttpMockSequence."""
+        return build_from_document(self.discovery_document(), http=http)
+
+    def discovery_document(self):
+        """Parsed Gmail discovery document, read from the local cache instead of fetched on every build."""
+        with self._lock:
+            if self._discovery is None:
+                self._discovery = self._load_discovery_document()
+            return self._discovery
+
+    def credentials(self):
+        with self._auth_lock:
+            if self._creds is None:
+                self._creds = self._load_credentials(interactive=True)
+                self._start_refresher()
+            return self._creds
+
+    def warm(self):
+        """Load what the first request would otherwise wait for; never starts the interactive OAuth flow."""
+        try:
+            self.openai()
+            self.discovery_document()
+            with self._auth_lock:
+                if self._creds is None and os.path.exists(self.token_path):
+                    self._creds = self._load_credentials(interactive=False)
+                    if self._creds:
+                        self._start_refresher()
+        except Exception as e:
+            logging.error(f"Could not warm API clients: {e}")
+
+    def _load_discovery_document(self):
+        if os.path.exists(self.discovery_cache_path):
+            try:
+                with open(self.discovery_cache_path, encoding='utf-8') as cache_file:
+                    return json.load(cache_file)
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not read cached discovery document: {e}")
+
+        # The client library ships a copy; download it only if that is missing
+        document = get_static_doc('gmail', 'v1')
+        if document is None:
+            response = self._session.get(DISCOVERY_URL, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            document = response.text
+
+        directory = os.path.dirname(self.discovery_cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.discovery_cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as cache_file:
+            cache_file.write(document)
+        os.replace(temp_path, self.discovery_cache_path)
+        return json.loads(document)
+
+    def _load_credentials(self, interactive):
+        creds = None
+        # Load credentials from token.json, refresh or re-authenticate if needed
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, self.scopes)
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request(self._session))
+            elif interactive:
+                flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, self.scopes)
+                creds = flow.run_local_server(port=0)
+            else:
+                return None
+            self._save_credentials(creds)
+        return creds
+
+    def _save_credentials(self, creds):
+        with open(self.token_path, 'w') as token:
+            token.write(creds.to_json())
+
+    def _start_refresher(self):
+        if self._refresher is None and self._creds.refresh_token:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="oauth-refresh", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            delay = TOKEN_REFRESH_RETRY
+            if self._creds.expiry:
+                # google-auth keeps expiry as a naive UTC datetime
+                now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+                delay = (self._creds.expiry - now).total_seconds() - TOKEN_REFRESH_MARGIN
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            try:
+                with self._auth_lock:
+                    self._creds.refresh(Request(self._session))
+                    self._save_credentials(self._creds)
+                logging.info("Refreshed Gmail OAuth token")
+            except Exception as e:
+                logging.error(f"Background token refresh failed: {e}")
+                time.sleep(TOKEN_REFRESH_RETRY)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_client_registry():
+    """Process-wide registry shared by every service that talks to OpenAI or Gmail."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+        return _registry
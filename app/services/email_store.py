@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from app.models.email_model import Email, Resume, ResponseEmail, ProcessedEmail
+
+EMAIL_STORE_PATH = os.getenv("EMAIL_STORE_PATH", os.path.join('app', 'data', 'emails.sqlite3'))
+# A 'sending' claim older than this is left over from a worker that died mid-send
+SEND_CLAIM_TIMEOUT = int(os.getenv("SEND_CLAIM_TIMEOUT", "600"))
+
+# Lifecycle of a stored email; 'sending' is held by the process that claimed it for sending
+STATUS_NEW = 'new'
+STATUS_PROCESSED = 'processed'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+
+# Message IDs bound per IN (...) query, below SQLite's limit on query parameters
+IN_QUERY_CHUNK = 500
+
+# Columns added after the first release of the emails table
+EMAIL_COLUMNS = [
+    ('sender', "TEXT"),
+    ('status', f"TEXT NOT NULL DEFAULT '{STATUS_NEW}'"),
+    ('skill_match', "TEXT"),
+    ('sent_at', "REAL"),
+    ('claimed_at', "REAL")
+]
+
+class EmailStore:
+    """
+    Local record of the Gmail sync position and of every recruiter email with its resume, response and
+    send status. Safe to share between threads and between processes using the same file.
+    """
+
+    ROW_COLUMNS = "email, resume, response, skill_match, status"
+
+    def __init__(self, path=EMAIL_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets other Flask workers read while one of them writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS seen_messages (
+                    message_id TEXT PRIMARY KEY,
+                    is_recruiter INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS emails (
+                    message_id TEXT PRIMARY KEY,
+                    received_at INTEGER NOT NULL,
+                    email TEXT NOT NULL,
+                    resume TEXT,
+                    response TEXT,
+                    resume_tag TEXT,
+                    processed_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_received_at ON emails (received_at)")
+            self._migrate()
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_status ON emails (status, received_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_sender ON emails (sender)")
+            self._release_stale_claims()
+
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(emails)")}
+        added = [column for column, _ in EMAIL_COLUMNS if column not in columns]
+        for column, definition in EMAIL_COLUMNS:
+            if column in added:
+                self._conn.execute(f"ALTER TABLE emails ADD COLUMN {column} {definition}")
+        if added:
+            self._conn.execute("UPDATE emails SET sender = json_extract(email, '$.sender') WHERE sender IS NULL")
+            self._conn.execute(
+                "UPDATE emails SET status = ? WHERE status = ? AND resume IS NOT NULL", (STATUS_PROCESSED, STATUS_NEW)
+            )
+
+    def _release_stale_claims(self):
+        released = self._conn.execute(
+            "UPDATE emails SET status = ?, claimed_at = NULL WHERE status = ? AND (claimed_at IS NULL OR claimed_at < ?)",
+            (STATUS_PROCESSED, STATUS_SENDING, time.time() - SEND_CLAIM_TIMEOUT)
+        ).rowcount
+        if released:
+            logging.warning(f"Released {released} stale send claims")
+
+    def get_history_id(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'history_id'").fetchone()
+        return row[0] if row else None
+
+    def set_history_id(self, history_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('history_id', ?)", (str(history_id),)
+            )
+
+    def unseen(self, message_ids):
+        """Filter message_ids down to the ones no earlier sync has classified."""
+        seen = {row[0] for row in self._select_ids("SELECT message_id FROM seen_messages", message_ids)}
+        return [message_id for message_id in message_ids if message_id not in seen]
+
+    def mark_seen(self, message_id, is_recruiter):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO seen_messages (message_id, is_recruiter) VALUES (?, ?)",
+                (message_id, int(is_recruiter))
+            )
+
+    def save_email(self, email, received_at):
+        """Store a parsed recruiter email; its resume and response are added by save_processed()."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO emails (message_id, received_at, email, sender) VALUES (?, ?, ?, ?)",
+                (email.message_id, int(received_at or 0), json.dumps(email.to_record()), email.sender)
+            )
+
+    def save_processed(self, processed_email, resume_tag):
+        """Store the resume and response for an email; emails that were already sent keep their sent reply."""
+        response_email = processed_email.response_email
+        email = processed_email.original_email
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO emails (message_id, received_at, email, sender) VALUES (?, 0, ?, ?)",
+                (email.message_id, json.dumps(email.to_record()), email.sender)
+            )
+            self._conn.execute(
+                "UPDATE emails SET resume = ?, response = ?, resume_tag = ?, skill_match = ?, processed_at = ?, "
+                "status = ? WHERE message_id = ? AND status IN (?, ?)",
+                (
+                    json.dumps(processed_email.tailored_resume.to_dict()),
+                    json.dumps(response_email.to_dict()) if response_email else None,
+                    resume_tag,
+                    json.dumps(processed_email.skill_match) if processed_email.skill_match else None,
+                    time.time(),
+                    STATUS_PROCESSED,
+                    email.message_id,
+                    STATUS_NEW,
+                    STATUS_PROCESSED
+                )
+            )
+
+    def get_processed(self, message_id):
+        """ProcessedEmail stored for message_id, or None if it has not been processed."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.ROW_COLUMNS} FROM emails WHERE message_id = ?", (message_id,)
+            ).fetchone()
+        return self._processed_from_row(row) if row and row[1] else None
+
+    def list_processed(self, status=None, sender=None, limit=50, offset=0):
+        """One page of processed emails, newest first, with the total matching count for paging."""
+        conditions = ["resume IS NOT NULL"]
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if sender:
+            conditions.append("sender = ?")
+            params.append(sender)
+        where = " AND ".join(conditions)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM emails WHERE {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {self.ROW_COLUMNS} FROM emails WHERE {where} "
+                "ORDER BY received_at DESC, processed_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [self._processed_from_row(row) for row in rows], total
+
+    def claim_for_sending(self, message_id):
+        """
+        Mark a processed email as being sent and return it, or None if it is missing, already sent or
+        claimed by another worker; the conditional update makes the claim atomic across processes.
+        """
+        with self._lock, self._conn:
+            claimed = self._conn.execute(
+                "UPDATE emails SET status = ?, claimed_at = ? "
+                "WHERE message_id = ? AND status = ? AND response IS NOT NULL",
+                (STATUS_SENDING, time.time(), message_id, STATUS_PROCESSED)
+            ).rowcount
+        return self.get_processed(message_id) if claimed else None
+
+    def finish_sending(self, processed_email, sent):
+        """Record the outcome of a claimed send; failed sends go back to 'processed' to be retried."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE emails SET status = ?, sent_at = ?, claimed_at = NULL WHERE message_id = ? AND status = ?",
+                (
+                    STATUS_SENT if sent else STATUS_PROCESSED,
+                    time.time() if sent else None,
+                    processed_email.original_email.message_id,
+                    STATUS_SENDING
+                )
+            )
+
+    def get_emails(self, message_ids):
+        """Stored Emails for message_ids, in the same order; IDs that are not stored are left out."""
+        rows = self._select_ids("SELECT message_id, email FROM emails", message_ids)
+        emails = {message_id: Email.from_dict(json.loads(email_json)) for message_id, email_json in rows}
+        return [emails[message_id] for message_id in message_ids if message_id in emails]
+
+    def load_pending(self, resume_tag):
+        """
+        Emails that still need a resume and response, newest first: those not processed yet and those
+        tailored to a different resume and not sent.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT email FROM emails WHERE resume IS NULL OR (resume_tag IS NOT ? AND status != ?) "
+                "ORDER BY received_at DESC",
+                (resume_tag, STATUS_SENT)
+            ).fetchall()
+        return [Email.from_dict(json.loads(row[0])) for row in rows]
+
+    def _select_ids(self, query, message_ids):
+        """Rows of query filtered to message_ids, queried IN_QUERY_CHUNK IDs at a time."""
+        message_ids = list(message_ids)
+        rows = []
+        with self._lock:
+            for start in range(0, len(message_ids), IN_QUERY_CHUNK):
+                chunk = message_ids[start:start + IN_QUERY_CHUNK]
+                rows.extend(self._conn.execute(
+                    f"{query} WHERE message_id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall())
+        return rows
+
+    @staticmethod
+    def _processed_from_row(row):
+        email_json, resume_json, response_json, skill_match_json, status = row
+        response_email = None
+        if response_json:
+            response_email = ResponseEmail.from_dict(dict(json.loads(response_json), sent=status == STATUS_SENT))
+        return ProcessedEmail(
+            Email.from_dict(json.loads(email_json)),
+            Resume.from_dict(json.loads(resume_json)),
+            response_email,
+            json.loads(skill_match_json) if skill_match_json else None
+        )
@@ -1,110 +1,382 @@
+import io
 import os
+import time
 import logging
 import base64
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.errors import HttpError
-from app.models.email_model import Email, ResponseEmail
-from openai import OpenAI
+from googleapiclient.http import MediaIoBaseUpload
+from app.models.email_model import Email, ResponseEmail, decode_body
+from app.services.recruiter_classifier import RecruiterClassifier
+from app.services.llm_cache import get_llm_cache, resume_tag
+from app.services.pdf_service import get_pdf_renderer
+from app.services.request_scheduler import get_scheduler, GMAIL_QUOTA_UNITS
+from app.services.client_registry import get_client_registry
+from app.services.prompt_compactor import PromptCompactor, CLASSIFIER_BODY_TOKENS
+from app.services.metrics import get_metrics, timed
 import json
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 
-# Update SCOPES to include send capability
-SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.send']
+# Contextual search query for recruiter-related emails
+RECRUITER_QUERY = 'subject:recruiter OR subject:job OR subject:hiring OR subject:opportunity'
+
+# Gmail accepts up to 100 calls per batch request but recommends 50 to avoid rate limiting
+BATCH_SIZE = 50
+# Largest page messages().list will return
+MAX_PAGE_SIZE = 500
+# Responses sent at the same time by send_emails; the Gmail quota in RequestScheduler paces them
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "4"))
+# Messages larger than this go through a resumable media upload instead of a base64 'raw' body
+SIMPLE_UPLOAD_LIMIT = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Model and system prompt for recruiter replies, shared by the interactive and Batch API paths
+RESPONSE_MODEL = "gpt-4o"
+RESPONSE_SYSTEM_PROMPT = "You are a professional job applicant crafting a response to a recruiter."
+# Classify and extract job details in one structured-output call instead of two free-text calls
+UNIFIED_EXTRACTION = os.getenv("UNIFIED_EXTRACTION", "1") == "1"
+# Returned by classify_and_parse when the LLM call failed, so the message is classified again next sync
+CLASSIFICATION_FAILED = object()
+
+# Structured output returned by analyze_email, built from the Email model's extracted fields
+EMAIL_ANALYSIS_SCHEMA = {
+    "name": "email_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "is_recruiter": {
+                "type": "boolean",
+                "description": "True if the email is from a recruiter or contains a job opportunity."
+            },
+            **Email.EXTRACTED_FIELDS
+        },
+        "required": ["is_recruiter", *Email.EXTRACTED_FIELDS],
+        "additionalProperties": False
+    }
+}
 
 class GmailService:
-    def __init__(self):
+    def __init__(self, http=None, unified_extraction=UNIFIED_EXTRACTION):
         self.service = None
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.unified_extraction = unified_extraction
+        # Optional httplib2-compatible transport (e.g. googleapiclient.http.HttpMockSequence) used instead of OAuth
+        self.http = http
+        self.clients = get_client_registry()
+        self.openai_client = self.clients.openai()
+        self.scheduler = get_scheduler()
+        self.classifier = RecruiterClassifier()
+        self.cache = get_llm_cache()
 
     def get_service(self):
-        if not self.service:
-            self.service = self._create_gmail_service()
-        return self.service
-
-    def _create_gmail_service(self):
-        creds = None
-        # Load credentials from token.json, refresh or re-authenticate if needed
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-                creds = flow.run_local_server(port=0)
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-
-        try:
-            service = build('gmail', 'v1', credentials=creds)
-            return service
-        except HttpError as error:
-            logging.error(f'An error occurred: {error}')
-            return None
+        # An explicit transport gets a single handle; otherwise each worker thread has its own connection
+        if not self.service and self.http is not None:
+            self.service = self.clients.gmail_for(self.http)
+        return self.service or self.clients.gmail()
 
     def get_recruiter_emails(self, user_id='me', max_results=11):
         try:
             service = self.get_service()
+            message_ids = self.list_message_ids(service, user_id, RECRUITER_QUERY, max_results)
+            messages = self.fetch_messages(service, user_id, message_ids)
+            recruiter_emails = []
 
-            # Contextual search query for recruiter-related emails
-            query = 'subject:recruiter OR subject:job OR subject:hiring OR subject:opportunity'
+            for msg in messages:
+                # Filter the email for recruiter criteria
+                email_data = self.classify_and_parse(msg)
+                if email_data and email_data is not CLASSIFICATION_FAILED:
+                    recruiter_emails.append(email_data)
 
-            # Fetch list of messages in the inbox matching the query
-            results = service.users().messages().list(
-                userId=user_id, 
-                labelIds=['INBOX'], 
-                q=query, 
-                maxResults=max_results
-            ).execute()
+            return recruiter_emails
 
-            messages = results.get('messages', [])
-            recruiter_emails = []
+        except Exception as e:
+            logging.error(f"An error occurred: {e}")
+            return []
 
-            for message in messages:
-                # Fetch the full message content for each email
-                msg = service.users().messages().get(
-                    userId=user_id, 
-                    id=message['id'], 
-                    format='full'
-                ).execute()
+    def sync_recruiter_emails(self, store, user_id='me', max_results=11):
+        """
+        Incremental variant of get_recruiter_emails: only messages added since the historyId recorded
+        in store are fetched and classified. New recruiter emails are saved to store and returned.
+        Messages that could not be fetched or classified keep the sync position where it was, so the
+        next sync lists them again; messages with a verdict are skipped from then on.
+        """
+        try:
+            service = self.get_service()
 
-                # Filter the email for recruiter criteria
-                if self.is_recruiter_email(msg):
-                    email_data = self.parse_email(msg)
-                    if email_data:
-                        recruiter_emails.append(email_data)
+            # Read the mailbox position before listing so mail arriving mid-sync is picked up next time
+            latest_history_id = self.scheduler.execute(
+                service.users().getProfile(userId=user_id), cost=GMAIL_QUOTA_UNITS['getProfile']
+            )['historyId']
+
+            message_ids = None
+            history_id = store.get_history_id()
+            if history_id:
+                added_ids = self.list_new_message_ids(service, user_id, history_id)
+                if added_ids is not None:
+                    # Same selection as the full scan: only recruiter-looking subjects, at most max_results
+                    message_ids = self.filter_by_query(service, user_id, added_ids, RECRUITER_QUERY, max_results)
+            if message_ids is None:
+                # First run, or the stored historyId has expired: fall back to a full scan
+                message_ids = self.list_message_ids(service, user_id, RECRUITER_QUERY, max_results)
+
+            unseen_ids = store.unseen(message_ids)
+            gone = []
+            messages = self.fetch_messages(service, user_id, unseen_ids, gone)
+            failed = len(unseen_ids) - len(messages) - len(gone)
+            for message_id in gone:
+                store.mark_seen(message_id, False)
+            recruiter_emails = []
 
+            for msg in messages:
+                email_data = self.classify_and_parse(msg)
+                if email_data is CLASSIFICATION_FAILED:
+                    failed += 1
+                    continue
+                if email_data:
+                    store.save_email(email_data, msg.get('internalDate'))
+                    recruiter_emails.append(email_data)
+                store.mark_seen(msg['id'], email_data is not None)
+
+            if failed:
+                logging.warning(f"{failed} messages could not be fetched or classified; they are retried next sync")
+            else:
+                store.set_history_id(latest_history_id)
             return recruiter_emails
 
         except Exception as e:
-            logging.error(f"An error occurred: {e}")
+            logging.error(f"An error occurred during incremental sync: {e}")
+            return []
+
+    @timed('gmail_history')
+    def list_new_message_ids(self, service, user_id, start_history_id):
+        """IDs of inbox messages added since start_history_id, or None if Gmail no longer has that history."""
+        message_ids = []
+        added_ids = set()
+        page_token = None
+
+        try:
+            while True:
+                results = self.scheduler.execute(service.users().history().list(
+                    userId=user_id,
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    labelId='INBOX',
+                    pageToken=page_token
+                ), cost=GMAIL_QUOTA_UNITS['history.list'])
+
+                for record in results.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        message_id = added['message']['id']
+                        if message_id not in added_ids:
+                            added_ids.add(message_id)
+                            message_ids.append(message_id)
+
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as error:
+            if error.resp.status == 404:
+                logging.info(f"History {start_history_id} is no longer available, running a full scan")
+                return None
+            raise
+
+        # History is oldest first; match the newest-first order of messages().list
+        return list(reversed(message_ids))
+
+    def filter_by_query(self, service, user_id, message_ids, query, max_results):
+        """The message_ids that also match query, in their original order, at most max_results of them."""
+        if not message_ids:
             return []
+        # Newly added messages are the newest in the inbox, so they come first in the query's results
+        matching = set(self.list_message_ids(service, user_id, query, max(max_results, len(message_ids))))
+        return [message_id for message_id in message_ids if message_id in matching][:max_results]
+
+    @timed('gmail_list')
+    def list_message_ids(self, service, user_id, query, max_results):
+        """Collect up to max_results matching message IDs, following nextPageToken across pages."""
+        message_ids = []
+        page_token = None
+
+        while len(message_ids) < max_results:
+            results = self.scheduler.execute(service.users().messages().list(
+                userId=user_id,
+                labelIds=['INBOX'],
+                q=query,
+                maxResults=min(max_results - len(message_ids), MAX_PAGE_SIZE),
+                pageToken=page_token
+            ), cost=GMAIL_QUOTA_UNITS['messages.list'])
+
+            message_ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+        return message_ids[:max_results]
+
+    @timed('gmail_fetch')
+    def fetch_messages(self, service, user_id, message_ids, gone=None):
+        """
+        Fetch full messages through the Gmail batch endpoint, BATCH_SIZE calls per round trip. IDs of
+        messages deleted in the meantime are appended to gone, if given.
+        """
+        fetched = {}
+        retry_ids = []
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            elif self.scheduler.is_retryable(exception):
+                retry_ids.append(request_id)
+            elif gone is not None and getattr(exception, 'resp', None) is not None and exception.resp.status == 404:
+                gone.append(request_id)
+            else:
+                logging.error(f"Failed to fetch message {request_id}: {exception}")
+
+        pending = list(message_ids)
+        for attempt in range(self.scheduler.max_retries + 1):
+            for start in range(0, len(pending), BATCH_SIZE):
+                chunk = pending[start:start + BATCH_SIZE]
+                batch = service.new_batch_http_request(callback=on_response)
+                for message_id in chunk:
+                    batch.add(
+                        service.users().messages().get(userId=user_id, id=message_id, format='full'),
+                        request_id=message_id
+                    )
+                self.scheduler.execute(batch, cost=GMAIL_QUOTA_UNITS['messages.get'] * len(chunk))
+
+            # Calls inside a batch fail individually; only the rate-limited ones are fetched again
+            if not retry_ids:
+                break
+            pending = list(retry_ids)
+            retry_ids.clear()
+            time.sleep(self.scheduler.backoff(attempt))
+        else:
+            logging.error(f"Gave up fetching {len(pending)} messages after repeated rate limiting")
+
+        # Keep the order returned by messages().list
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+    @timed('classify')
+    def classify_and_parse(self, msg):
+        """Return the parsed Email if msg is a recruiter email, None if not, CLASSIFICATION_FAILED if unknown."""
+        if not self.unified_extraction:
+            is_recruiter = self.is_recruiter_email(msg)
+            if is_recruiter is None:
+                return CLASSIFICATION_FAILED
+            return self.parse_email(msg) if is_recruiter else None
+
+        headers = msg.get('payload', {}).get('headers', [])
+        subject = next((header['value'] for header in headers if header['name'] == 'Subject'), 'No Subject')
+        sender = next((header['value'] for header in headers if header['name'] == 'From'), 'Unknown Sender')
+        bulk = any(header['name'].lower() in ('list-unsubscribe', 'list-id') for header in headers)
+        try:
+            body = self.get_email_body(msg)
+        except Exception as e:
+            logging.error(f"Could not decode body of message {msg.get('id')}: {e}")
+            body = ""
+
+        # Clear rejections never reach the LLM; everything else is classified and extracted in one call
+        verdict = self.classifier.classify(sender, subject, body, bulk=bulk, accept_needs_llm=True)
+        if verdict is False:
+            return None
+
+        analysis = self.analyze_email(msg['id'], subject, sender, body)
+        if analysis is None:
+            return CLASSIFICATION_FAILED
+        # The call is made for local accepts too, so its verdict overrides the local score
+        self.classifier.record(sender, analysis['is_recruiter'])
+        if not analysis['is_recruiter']:
+            return None
+
+        # The Email keeps a reference to the encoded part and decodes it again only if its body is read
+        return Email(
+            message_id=msg['id'],
+            subject=subject,
+            sender=sender,
+            raw_body=self.get_raw_body(msg),
+            **{field: analysis[field] for field in Email.EXTRACTED_FIELDS}
+        )
+
+    @timed('analyze_email')
+    def analyze_email(self, message_id, subject, sender, body):
+        """Classify an email and extract its job details with one schema-constrained gpt-4o call."""
+        prompt = (
+            "Decide whether the following email is from a recruiter or contains a job opportunity, and "
+            "extract the job details from it. Use empty values for details the email does not contain.\n\n"
+            f"From: {sender}\n"
+            f"Subject: {subject}\n\n"
+            f"{PromptCompactor.email_body(body)}"
+        )
+
+        cache_key = self.cache.make_key("gpt-4o", "analyze_email", message_id, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        PromptCompactor.record("analyze_email", prompt)
+        try:
+            response = self.scheduler.chat_completion(
+                self.openai_client,
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": "You are an AI assistant that extracts job information from emails."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_schema", "json_schema": EMAIL_ANALYSIS_SCHEMA}
+            )
+            message = response.choices[0].message
+            if message.refusal:
+                logging.error(f"OpenAI refused to analyze message {message_id}: {message.refusal}")
+                return None
+
+            # Strict structured outputs always match EMAIL_ANALYSIS_SCHEMA
+            analysis = json.loads(message.content)
+            self.cache.set(cache_key, analysis)
+            return analysis
+        except Exception as e:
+            logging.error(f"Error in analyze_email: {e}")
+            return None
 
     def is_recruiter_email(self, msg):
-        """Filter method to determine if an email is from a recruiter."""
+        """Filter method to determine if an email is from a recruiter; None if the LLM call failed."""
         headers = msg.get('payload', {}).get('headers', [])
         
         # Extract key headers like 'From' and 'Subject'
         from_header = next((header['value'] for header in headers if header['name'] == 'From'), None)
         subject = next((header['value'] for header in headers if header['name'] == 'Subject'), "").lower()
+        bulk = any(header['name'].lower() in ('list-unsubscribe', 'list-id') for header in headers)
 
-        # Define recruiter-related keywords or domains
-        recruiter_keywords = ['recruiter', 'hiring', 'opportunity', 'position', 'job offer', 'talent acquisition']
-        
-        # Generate a prompt for OpenAI to analyze the email
+        try:
+            body = self.get_email_body(msg)
+        except Exception as e:
+            logging.error(f"Could not decode body of message {msg.get('id')}: {e}")
+            body = ""
+
+        # Clear cases are decided locally; only ambiguous ones cost an LLM call
+        verdict = self.classifier.classify(from_header, subject, body, bulk=bulk)
+        if verdict is not None:
+            return verdict
+
+        # Generate a trimmed prompt for OpenAI to analyze the email
         prompt = f"""
-        The following email has the subject "{subject}" and body "{msg}" from {from_header}.
+        The following email has the subject "{subject}" from {from_header} and body:
+
+        {PromptCompactor.email_body(body, CLASSIFIER_BODY_TOKENS)}
+
         Determine if this email is likely from a recruiter or contains job-related opportunities. 
         Respond with 'True' if it is, otherwise 'False'.
         """
 
+        cache_key = self.cache.make_key("gpt-4o-mini", "is_recruiter_email", msg.get('id'), prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        PromptCompactor.record("is_recruiter_email", prompt)
         try:
-            response = self.openai_client.chat.completions.create(
+            response = self.scheduler.chat_completion(
+                self.openai_client,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are an AI assistant that extracts job information from emails."},
@@ -112,10 +384,13 @@ class GmailService:
                 ]
             )
             content = response.choices[0].message.content.strip()
-            return content.lower() == 'true'
+            is_recruiter = content.lower() == 'true'
+            self.classifier.record(from_header, is_recruiter)
+            self.cache.set(cache_key, is_recruiter)
+            return is_recruiter
         except Exception as e:
             logging.error(f"Error in is_recruiter_email: {e}")
-            return False
+            return None
 
     def parse_email(self, msg):
         headers = msg['payload']['headers']
@@ -123,13 +398,13 @@ class GmailService:
         sender = next((header['value'] for header in headers if header['name'] == 'From'), 'Unknown Sender')
         body = self.get_email_body(msg)
         
-        extracted_data = self.extract_job_details(body)
+        extracted_data = self.extract_job_details(body, message_id=msg['id'])
         
         return Email(
             message_id=msg['id'],
             subject=subject,
             sender=sender,
-            body=body,
+            raw_body=self.get_raw_body(msg),
             job_description=extracted_data.get('job_description', ''),
             company_info=extracted_data.get('company_info', ''),
             key_requirements=extracted_data.get('key_requirements', []),
@@ -137,15 +412,20 @@ class GmailService:
         )
 
     def get_email_body(self, msg):
+        return decode_body(self.get_raw_body(msg))
+
+    def get_raw_body(self, msg):
+        """base64url data of the message's text/plain part, or None."""
         if 'parts' in msg['payload']:
             for part in msg['payload']['parts']:
                 if part['mimeType'] == 'text/plain':
-                    return base64.urlsafe_b64decode(part['body']['data']).decode()
+                    return part['body']['data']
         elif 'body' in msg['payload']:
-            return base64.urlsafe_b64decode(msg['payload']['body']['data']).decode()
-        return ""
+            return msg['payload']['body']['data']
+        return None
     
-    def extract_job_details(self, email_body):
+    @timed('extract_job_details')
+    def extract_job_details(self, email_body, message_id=None):
         # Ensure the email body is included in the prompt
         if not email_body.strip():
             logging.error("Email body is empty. Cannot proceed with extraction.")
@@ -167,11 +447,18 @@ class GmailService:
             "    \"required_skills\": [\"Skill 1\", \"Skill 2\", \"Skill 3\"]\n"
             "}\n\n"
             "Here is the email body:\n\n"
-            f"{email_body}"
+            f"{PromptCompactor.email_body(email_body)}"
         )
 
+        cache_key = self.cache.make_key("gpt-4o", "extract_job_details", message_id, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        PromptCompactor.record("extract_job_details", prompt)
         try:
-            response = self.openai_client.chat.completions.create(
+            response = self.scheduler.chat_completion(
+                self.openai_client,
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You are an AI assistant that extracts job information from emails."},
@@ -197,6 +484,7 @@ class GmailService:
             
             # Parse the cleaned content as JSON
             parsed_response = json.loads(cleaned_content)
+            self.cache.set(cache_key, parsed_response)
             return parsed_response
 
         except json.JSONDecodeError as e:
@@ -244,13 +532,41 @@ class GmailService:
 
 
 
-    def compose_response_email(self, original_email, user_profile, tailored_resume):
-        prompt = f"""
+    @timed('compose_response')
+    def compose_response_email(self, original_email, user_profile, tailored_resume, on_delta=None):
+        """Write the reply to original_email; with on_delta the text is streamed to it as it is generated."""
+        prompt = self.build_response_prompt(original_email, user_profile)
+
+        try:
+            response_body = self.cache.get(self.response_cache_key(original_email, prompt))
+            if response_body is not None:
+                if on_delta:
+                    on_delta(response_body)
+            else:
+                PromptCompactor.record("compose_response_email", prompt)
+                messages = [
+                    {"role": "system", "content": RESPONSE_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ]
+                if on_delta:
+                    response_body = self.scheduler.stream_completion(
+                        self.openai_client, on_delta, model=RESPONSE_MODEL, messages=messages
+                    ).strip()
+                else:
+                    response = self.scheduler.chat_completion(self.openai_client, model=RESPONSE_MODEL, messages=messages)
+                    response_body = response.choices[0].message.content.strip()
+            return self.build_response_email(original_email, user_profile, tailored_resume, response_body, prompt)
+        except Exception as e:
+            logging.error(f"Error in compose_response_email: {e}")
+            return None
+
+    def build_response_prompt(self, original_email, user_profile):
+        return f"""
         Compose a professional email response to a recruiter based on the following information:
 
         Original Email Subject: {original_email.subject}
-        Job Description: {original_email.job_description}
-        Company Info: {original_email.company_info}
+        Job Description: {PromptCompactor.field(original_email.job_description)}
+        Company Info: {PromptCompactor.field(original_email.company_info)}
         Applicant Name: {user_profile.name}
         Applicant Email: {user_profile.email}
 
@@ -263,43 +579,81 @@ class GmailService:
         Keep the email concise (about 150-200 words), professional, and engaging.
         """
 
-        try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a professional job applicant crafting a response to a recruiter."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            response_body = response.choices[0].message.content.strip()
-            subject = f"Re: {original_email.subject}"
-            resume_pdf_path = os.path.join('app', 'generated_resumes', tailored_resume.pdf_filename)
+    def response_cache_key(self, original_email, prompt):
+        return self.cache.make_key(RESPONSE_MODEL, "compose_response_email", original_email.message_id, prompt)
 
-            return ResponseEmail(original_email.sender, subject, response_body, resume_pdf_path)
-        except Exception as e:
-            logging.error(f"Error in compose_response_email: {e}")
-            return None
-
-    def send_email(self, response_email):
-        try:
-            service = self.get_service()
-            message = MIMEMultipart()
-            message['to'] = response_email.to
-            message['subject'] = response_email.subject
+    def build_response_email(self, original_email, user_profile, tailored_resume, response_body, prompt):
+        self.cache.set(self.response_cache_key(original_email, prompt), response_body,
+                       tag=resume_tag(user_profile.resume_content))
+        subject = f"Re: {original_email.subject}"
+        resume_pdf_path = os.path.join('app', 'generated_resumes', tailored_resume.pdf_filename)
+        return ResponseEmail(original_email.sender, subject, response_body, resume_pdf_path)
 
-            message.attach(MIMEText(response_email.body))
+    def send_emails(self, response_emails, workers=SEND_WORKERS):
+        """
+        Send several responses concurrently, paced by the Gmail quota in the shared scheduler. Responses
+        sharing a resume read the PDF once. Returns an error message per response, None where it was sent.
+        """
+        if not response_emails:
+            return []
 
-            with open(response_email.resume_pdf_path, 'rb') as file:
-                attachment = MIMEApplication(file.read(), _subtype="pdf")
-            attachment.add_header('Content-Disposition', 'attachment', filename='tailored_resume.pdf')
-            message.attach(attachment)
+        def send(response_email):
+            pdf_bytes = attachments[response_email.resume_pdf_path]
+            if pdf_bytes is None:
+                return f"Could not read attachment {response_email.resume_pdf_path}"
+            try:
+                # Each worker thread gets its own Gmail connection from get_service()
+                sent_message = self._send(self.get_service(), response_email, pdf_bytes)
+                logging.info(f"Message sent. Message Id: {sent_message['id']}")
+                return None
+            except Exception as e:
+                logging.error(f"Failed to send response to {response_email.to}: {e}")
+                return str(e)
+
+        paths = list(dict.fromkeys(response_email.resume_pdf_path for response_email in response_emails))
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(response_emails)))) as executor:
+            attachments = dict(zip(paths, executor.map(self._read_attachment, paths)))
+            return list(executor.map(get_metrics().in_context(send), response_emails))
+
+    @staticmethod
+    def _read_attachment(path):
+        """PDF bytes for path, or None if it cannot be read; the send then reports the error."""
+        try:
+            # Lazily registered resumes are rendered only once they are actually sent
+            get_pdf_renderer().ensure_rendered(path)
+            with open(path, 'rb') as file:
+                return file.read()
+        except Exception as e:
+            # Includes a broken PDF render pool, not just a missing file
+            logging.error(f"Could not read attachment {path}: {e}")
+            return None
 
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
-            sent_message = service.users().messages().send(userId='me', body={'raw': raw_message}).execute()
-            
-            logging.info(f"Message sent. Message Id: {sent_message['id']}")
-            response_email.sent = True
-            return True
-        except HttpError as error:
-            logging.error(f'An error occurred: {error}')
-            return False
+    @timed('send_email')
+    def _send(self, service, response_email, pdf_bytes):
+        message = self.build_message(response_email, pdf_bytes)
+        mime_bytes = message.as_bytes()
+
+        # The 'raw' field is base64, a third larger than the message itself
+        if len(mime_bytes) * 4 // 3 <= SIMPLE_UPLOAD_LIMIT:
+            raw_message = base64.urlsafe_b64encode(mime_bytes).decode('utf-8')
+            request = service.users().messages().send(userId='me', body={'raw': raw_message})
+        else:
+            # Large messages go up as raw RFC 822 in resumable chunks instead of one base64 JSON body
+            media = MediaIoBaseUpload(io.BytesIO(mime_bytes), mimetype='message/rfc822',
+                                      chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+            request = service.users().messages().send(userId='me', body={}, media_body=media)
+        return self.scheduler.execute(request, cost=GMAIL_QUOTA_UNITS['messages.send'], idempotent=False)
+
+    @staticmethod
+    def build_message(response_email, pdf_bytes):
+        """MIME message for a response with the tailored resume PDF, already read by _read_attachment."""
+        message = MIMEMultipart()
+        message['to'] = response_email.to
+        message['subject'] = response_email.subject
+
+        message.attach(MIMEText(response_email.body))
+
+        attachment = MIMEApplication(pdf_bytes, _subtype="pdf")
+        attachment.add_header('Content-Disposition', 'attachment', filename='tailored_resume.pdf')
+        message.attach(attachment)
+        return message
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from app.services.metrics import get_metrics
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join('app', 'data', 'jobs.sqlite3'))
+# Number of jobs run at the same time by this process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Seconds an idle worker or event stream waits before checking the queue again
+POLL_INTERVAL = 0.5
+# Runs a job gets before one interrupted by a dying worker process is marked failed instead of requeued
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "2"))
+
+def _process_alive(pid):
+    # A new process that got the pid of the one that died is still this one, which has no jobs yet
+    if pid is None or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobDeferred(Exception):
+    """
+    Raised by a handler waiting on something slow, such as a Batch API batch, to free its worker. The job
+    is queued again to run after delay seconds, and that run gets checkpoint back as payload['checkpoint'].
+    """
+
+    def __init__(self, delay, checkpoint=None):
+        super().__init__(f"Deferred for {delay}s")
+        self.delay = delay
+        self.checkpoint = checkpoint
+
+class JobQueue:
+    """
+    SQLite-backed job queue drained by a pool of local worker threads. handler(payload, publish) runs
+    each job and calls publish(result) for every partial result, which pollers and streams pick up.
+    publish(data, event) records other events, which only event streams receive.
+    """
+
+    def __init__(self, handler, path=JOB_DB_PATH, workers=JOB_WORKERS):
+        self.handler = handler
+        self.path = path
+        self.workers = workers
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode so claiming a job can use an explicit BEGIN IMMEDIATE across processes
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in (('worker_pid', "INTEGER"), ('attempts', "INTEGER NOT NULL DEFAULT 0"),
+                                   ('checkpoint', "TEXT"), ('checkpoint_seq', "INTEGER"), ('run_after', "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(job_results)")}
+        if 'event' not in columns:
+            self._conn.execute("ALTER TABLE job_results ADD COLUMN event TEXT NOT NULL DEFAULT 'result'")
+
+    def start(self):
+        if not self._threads:
+            self.recover()
+        for _ in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._worker_loop, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def recover(self):
+        """
+        Requeue jobs left 'running' by a worker process that is gone, dropping the results of the interrupted
+        run (results published before a JobDeferred are kept); after MAX_JOB_ATTEMPTS runs they are marked
+        failed instead.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, worker_pid, attempts FROM jobs WHERE status = 'running'"
+                ).fetchall()
+                stale = [(job_id, attempts) for job_id, worker_pid, attempts in rows if not _process_alive(worker_pid)]
+                for job_id, attempts in stale:
+                    if attempts >= MAX_JOB_ATTEMPTS:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                            ("Worker stopped while running the job", time.time(), job_id)
+                        )
+                    else:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = 'queued', started_at = NULL, worker_pid = NULL WHERE id = ?",
+                            (job_id,)
+                        )
+                        self._conn.execute(
+                            "DELETE FROM job_results WHERE job_id = ? "
+                            "AND seq >= (SELECT COALESCE(checkpoint_seq, 0) FROM jobs WHERE id = ?)",
+                            (job_id, job_id)
+                        )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if stale:
+            logging.warning(f"Recovered {len(stale)} jobs interrupted by a stopped worker")
+
+    def enqueue(self, payload):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(payload), time.time())
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get_job(self, job_id, since=0):
+        """Job status plus the results published from position since onwards, or None for unknown IDs."""
+        with self._lock:
+            job = self._get_status(job_id)
+            if job is None:
+                return None
+            results = self._conn.execute(
+                "SELECT result FROM job_results WHERE job_id = ? AND event = 'result' ORDER BY seq LIMIT -1 OFFSET ?",
+                (job_id, since)
+            ).fetchall()
+        job['results'] = [json.loads(result[0]) for result in results]
+        return job
+
+    def follow(self, job_id):
+        """Yield (event, data) for every published event as it arrives, then ('status', job) once the job ends."""
+        seen = 0
+        while True:
+            with self._lock:
+                # Status first: a job that has ended has published all of its events
+                job = self._get_status(job_id)
+                if job is None:
+                    return
+                events = self._conn.execute(
+                    "SELECT event, result FROM job_results WHERE job_id = ? AND seq >= ? ORDER BY seq", (job_id, seen)
+                ).fetchall()
+            for event, data in events:
+                seen += 1
+                yield event, json.loads(data)
+            if job['status'] in ('done', 'failed'):
+                yield 'status', job
+                return
+            time.sleep(POLL_INTERVAL)
+
+    def _get_status(self, job_id):
+        row = self._conn.execute(
+            "SELECT status, error, created_at, started_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, error, created_at, started_at, finished_at = row
+        return {
+            'id': job_id,
+            'status': status,
+            'error': error,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at
+        }
+
+    def _publish(self, job_id, data, event='result'):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO job_results (job_id, seq, event, result) "
+                "SELECT ?, COALESCE(MAX(seq) + 1, 0), ?, ? FROM job_results WHERE job_id = ?",
+                (job_id, event, json.dumps(data), job_id)
+            )
+
+    def _claim(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload, checkpoint FROM jobs WHERE status = 'queued' "
+                    "AND (run_after IS NULL OR run_after <= ?) ORDER BY created_at LIMIT 1",
+                    (time.time(),)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, worker_pid = ?, attempts = attempts + 1 "
+                        "WHERE id = ?",
+                        (time.time(), os.getpid(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        payload = json.loads(row[1])
+        if row[2]:
+            payload['checkpoint'] = json.loads(row[2])
+        return row[0], payload
+
+    def _defer(self, job_id, delay, checkpoint):
+        # Waiting is not a failed run, so it does not count towards MAX_JOB_ATTEMPTS
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', run_after = ?, checkpoint = ?, worker_pid = NULL, "
+                "attempts = attempts - 1, "
+                "checkpoint_seq = (SELECT COALESCE(MAX(seq) + 1, 0) FROM job_results WHERE job_id = ?) WHERE id = ?",
+                (time.time() + delay, json.dumps(checkpoint) if checkpoint is not None else None, job_id, job_id)
+            )
+        self._wakeup.set()
+
+    def _finish(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def _worker_loop(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logging.error(f"Could not claim job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+
+            job_id, payload = job
+            metrics = get_metrics()
+            try:
+                with metrics.trace(job_id), metrics.span('job'):
+                    self.handler(payload, lambda data, event='result': self._publish(job_id, data, event))
+                self._finish(job_id, 'done')
+            except JobDeferred as e:
+                self._defer(job_id, e.delay, e.checkpoint)
+            except Exception as e:
+                logging.error(f"Job {job_id} failed: {e}")
+                self._finish(job_id, 'failed', str(e))
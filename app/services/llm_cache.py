@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join('app', 'cache', 'llm_cache.sqlite3'))
+# Seconds before a cached result is considered stale (default one week)
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Least recently used entries are evicted beyond this many rows
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+class LLMCache:
+    """SQLite-backed, content-addressed cache for OpenAI results with TTL and LRU eviction."""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    tag TEXT,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries (accessed_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_tag ON entries (tag)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @staticmethod
+    def make_key(model, *inputs):
+        """Hash the model name and every prompt input (message ID, prompt text, ...) into a cache key."""
+        payload = json.dumps([model, *inputs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.ttl:
+                    if row is not None:
+                        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return json.loads(row[0])
+        except sqlite3.Error as e:
+            logging.error(f"LLM cache read failed: {e}")
+            return None
+
+    def set(self, key, value, tag=None):
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, tag, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(value), tag, now, now)
+                )
+                count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at ASC LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+        except sqlite3.Error as e:
+            logging.error(f"LLM cache write failed: {e}")
+
+    def invalidate(self, tag):
+        """Drop every entry stored under tag, e.g. everything generated from an outdated resume."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE tag = ?", (tag,))
+
+    def track_resume(self, resume_content):
+        """Record the current resume and drop results tailored to the previously recorded one."""
+        tag = resume_tag(resume_content)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'resume_tag'").fetchone()
+            if row and row[0] != tag:
+                self._conn.execute("DELETE FROM entries WHERE tag = ?", (row[0],))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('resume_tag', ?)", (tag,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+    def collect(self):
+        """Hit and miss counters for the /metrics endpoint."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return [
+            ('llm_cache_hits_total', 'counter', "LLM cache lookups that returned a stored result.", [({}, hits)]),
+            ('llm_cache_misses_total', 'counter', "LLM cache lookups that missed or found a stale entry.", [({}, misses)])
+        ]
+
+def resume_tag(resume_content):
+    """Tag for cache entries that depend on the user's resume content."""
+    return "resume:" + hashlib.sha256((resume_content or '').encode('utf-8')).hexdigest()[:16]
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Process-wide cache shared by GmailService and OpenAIService."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache()
+        return _shared_cache
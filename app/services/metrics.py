@@ -0,0 +1,258 @@
+import os
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Keep a per-job trace of every span; off by default to save memory
+PIPELINE_TRACING = os.getenv("PIPELINE_TRACING", "0") == "1"
+MAX_TRACES = int(os.getenv("MAX_TRACES", "50"))
+# Directory for cProfile dumps of the profiled entry points; unset disables profiling
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+
+HELP = {
+    'pipeline_stage_seconds': "Time spent in each pipeline stage.",
+    'pipeline_stage_errors_total': "Pipeline stages that ended with an exception.",
+    'openai_requests_total': "OpenAI API requests by model and outcome.",
+    'openai_tokens_total': "Tokens reported in OpenAI usage by model and kind.",
+    'gmail_requests_total': "Gmail API requests by method.",
+    'gmail_quota_units_total': "Gmail quota units charged.",
+    'pdf_render_seconds': "Time from queueing a PDF render to its completion."
+}
+
+# Trace of the job the current thread (or a task copied from it) is working on
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+# Before Python 3.12 cProfile only sees the thread that enabled it, so tasks started with in_context
+# while a profiled call runs get their own profiler, merged into the call's dump
+PER_THREAD_PROFILING = sys.version_info < (3, 12)
+_current_profiles = contextvars.ContextVar('current_profiles', default=None)
+# From Python 3.12 only one profiler can be active per process (and it sees every thread), so calls that
+# overlap a running profile go unprofiled
+_process_profile_lock = threading.Lock()
+
+class Metrics:
+    """
+    In-process counters and latency histograms, rendered in the Prometheus text format. Other
+    components with their own counters (LLM cache, classifier, prompt compactor) register collectors
+    that return (name, type, help, [(labels, value), ...]) tuples at scrape time.
+    """
+
+    def __init__(self, tracing=PIPELINE_TRACING, max_traces=MAX_TRACES):
+        self.tracing = tracing
+        self.max_traces = max_traces
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time the block as one pipeline stage and add it to the current trace."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe('pipeline_stage_seconds', duration, stage=stage)
+            if error is not None:
+                self.inc('pipeline_stage_errors_total', stage=stage)
+            trace = _current_trace.get()
+            if trace is not None:
+                with self._lock:
+                    trace['spans'].append({
+                        'stage': stage,
+                        'start': round(start - trace['started'], 6),
+                        'duration': round(duration, 6),
+                        'thread': threading.current_thread().name,
+                        'error': str(error) if error is not None else None,
+                        **labels
+                    })
+
+    def timed(self, stage):
+        """Decorator form of span()."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def trace(self, trace_id=None):
+        """Collect the spans of the block (and of tasks started with in_context) under trace_id."""
+        if not self.tracing:
+            yield None
+            return
+        trace_id = trace_id or uuid.uuid4().hex
+        trace = {'id': trace_id, 'started': time.perf_counter(), 'created_at': time.time(), 'spans': []}
+        with self._lock:
+            self._traces[trace_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        token = _current_trace.set(trace)
+        try:
+            yield trace_id
+        finally:
+            _current_trace.reset(token)
+
+    @staticmethod
+    def in_context(fn):
+        """Wrap fn so that, run on another thread, it sees the caller's context: its trace and request priority."""
+        context = contextvars.copy_context()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # A context can only be entered by one thread at a time, so each call runs in its own copy
+            return context.copy().run(_call_profiled, fn, *args, **kwargs)
+        return wrapper
+
+    def get_trace(self, trace_id):
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            if trace is None:
+                return None
+            spans = sorted(trace['spans'], key=lambda span: span['start'])
+            return {'id': trace['id'], 'created_at': trace['created_at'], 'spans': spans}
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._histograms.items()}
+            collectors = list(self._collectors)
+
+        families = OrderedDict()
+        for (name, labels), value in sorted(counters.items()):
+            families.setdefault(name, ('counter', HELP.get(name, ''), []))[2].append((dict(labels), value))
+        for collector in collectors:
+            try:
+                for name, metric_type, help_text, samples in collector():
+                    families.setdefault(name, (metric_type, help_text, []))[2].extend(samples)
+            except Exception as e:
+                logging.error(f"Metrics collector failed: {e}")
+
+        lines = []
+        for name, (metric_type, help_text, samples) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        by_name = OrderedDict()
+        for (name, labels), histogram in sorted(histograms.items()):
+            by_name.setdefault(name, []).append((dict(labels), histogram))
+        for name, series in by_name.items():
+            lines.append(f"# HELP {name} {HELP.get(name, '')}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series:
+                for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(dict(labels, le='+Inf'))} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), " ")}"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def _call_profiled(fn, *args, **kwargs):
+    profiles = _current_profiles.get()
+    if profiles is None:
+        return fn(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn, *args, **kwargs)
+    finally:
+        profiles.append(profiler)
+
+def _profile_call(name, fn, args, kwargs):
+    profiler = cProfile.Profile()
+    profiles = []
+    token = _current_profiles.set(profiles if PER_THREAD_PROFILING else None)
+    try:
+        return profiler.runcall(fn, *args, **kwargs)
+    finally:
+        _current_profiles.reset(token)
+        stats = pstats.Stats(profiler)
+        for task_profiler in profiles:
+            stats.add(task_profiler)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}_{int(time.time() * 1000)}.prof")
+        stats.dump_stats(path)
+        logging.info(f"Profile of {name} written to {path} ({stats.total_tt:.3f}s)")
+
+def profiled(name):
+    """
+    Opt-in cProfile of every call to the decorated function, including the tasks it starts with
+    in_context on other threads, dumped to PROFILE_DIR when it is set.
+    """
+    def decorator(fn):
+        if not PROFILE_DIR:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if PER_THREAD_PROFILING:
+                return _profile_call(name, fn, args, kwargs)
+            if not _process_profile_lock.acquire(blocking=False):
+                logging.info(f"Not profiling {name}: another profile is running")
+                return fn(*args, **kwargs)
+            try:
+                return _profile_call(name, fn, args, kwargs)
+            finally:
+                _process_profile_lock.release()
+        return wrapper
+    return decorator
+
+_metrics = Metrics()
+
+def get_metrics():
+    return _metrics
+
+def span(stage, **labels):
+    return _metrics.span(stage, **labels)
+
+def timed(stage):
+    return _metrics.timed(stage)
@@ -1,76 +1,114 @@
-import os
 import logging
-from openai import OpenAI
 from app.models.email_model import Resume
+from app.services.llm_cache import get_llm_cache, resume_tag
+from app.services.pdf_service import get_pdf_renderer
+from app.services.skill_matcher import get_skill_index
+from app.services.request_scheduler import get_scheduler
+from app.services.client_registry import get_client_registry
+from app.services.prompt_compactor import PromptCompactor
+from app.services.metrics import span, timed
 import markdown2
-from xhtml2pdf import pisa
-import uuid
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Same pooled client as GmailService
+client = get_client_registry().openai()
+
+# Model and system prompt for resume tailoring, shared by the interactive and Batch API paths
+RESUME_MODEL = "gpt-4o"
+RESUME_SYSTEM_PROMPT = "You are a professional resume writer."
 
 class OpenAIService:
     @staticmethod
-    def generate_tailored_resume(email, user_profile):
+    @timed('tailor_resume')
+    def generate_tailored_resume(email, user_profile, on_delta=None):
+        """Tailor the resume for email; with on_delta the Markdown is streamed to it as it is generated."""
         try:
-            prompt = f"""
+            prompt = OpenAIService.build_resume_prompt(email, user_profile)
+            cache = get_llm_cache()
+            cached = cache.get(OpenAIService.resume_cache_key(email, prompt))
+
+            if cached is not None:
+                resume_content = cached['content']
+                if on_delta:
+                    on_delta(resume_content)
+            else:
+                PromptCompactor.record("generate_tailored_resume", prompt)
+                messages = [
+                    {"role": "system", "content": RESUME_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ]
+                if on_delta:
+                    resume_content = get_scheduler().stream_completion(
+                        client, on_delta, model=RESUME_MODEL, messages=messages
+                    ).strip()
+                else:
+                    response = get_scheduler().chat_completion(client, model=RESUME_MODEL, messages=messages)
+                    resume_content = response.choices[0].message.content.strip()
+
+            # Reuse the PDF rendered for the cached result while it is still on disk
+            pdf_filename = cached.get('pdf_filename') if cached else None
+            if pdf_filename and not get_pdf_renderer().is_available(pdf_filename):
+                pdf_filename = None
+
+            return OpenAIService.build_resume(email, user_profile, resume_content, prompt, pdf_filename)
+        except Exception as e:
+            logging.error(f"Error generating tailored resume: {str(e)}")
+            return None
+
+    @staticmethod
+    def build_resume_prompt(email, user_profile):
+        return f"""
             Create a tailored resume based on the following:
 
             Job Description:
-            {email.job_description}
+            {PromptCompactor.field(email.job_description)}
 
             Company Information:
-            {email.company_info}
+            {PromptCompactor.field(email.company_info)}
 
             Key Requirements:
-            {', '.join(email.key_requirements)}
+            {PromptCompactor.field(email.key_requirements)}
 
             Required Skills:
-            {', '.join(email.required_skills)}
+            {PromptCompactor.field(email.required_skills)}
 
             User's Existing Resume:
-            {user_profile.resume_content}
+            {PromptCompactor.resume_digest(user_profile)}
 
             Generate a professional resume in Markdown format that highlights relevant skills and experiences.
             """
 
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a professional resume writer."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            resume_content = response.choices[0].message.content.strip()
-            html_content = markdown2.markdown(resume_content)
-            matched_skills = OpenAIService.match_skills(email.required_skills, resume_content)
-            
-            pdf_filename = OpenAIService.generate_pdf_resume(html_content, user_profile.name)
-            
-            return Resume(resume_content, html_content, matched_skills, pdf_filename)
-        except Exception as e:
-            logging.error(f"Error generating tailored resume: {str(e)}")
-            return None
+    @staticmethod
+    def resume_cache_key(email, prompt):
+        return get_llm_cache().make_key(RESUME_MODEL, "generate_tailored_resume", email.message_id, prompt)
+
+    @staticmethod
+    def build_resume(email, user_profile, resume_content, prompt, pdf_filename=None):
+        """Turn generated Markdown into a Resume, rendering the PDF unless pdf_filename is already known."""
+        matched_skills = OpenAIService.match_skills(email.required_skills, resume_content)
+        if not pdf_filename:
+            pdf_filename = OpenAIService.generate_pdf_resume(OpenAIService.html_for(resume_content), user_profile.name)
+        get_llm_cache().set(
+            OpenAIService.resume_cache_key(email, prompt),
+            {'content': resume_content, 'pdf_filename': pdf_filename},
+            tag=resume_tag(user_profile.resume_content)
+        )
+        # The HTML is only needed for the PDF; Resume renders it again if anything else asks for it
+        return Resume(resume_content, None, matched_skills, pdf_filename)
+
+    @staticmethod
+    def html_for(resume_content):
+        return markdown2.markdown(resume_content)
 
     @staticmethod
     def match_skills(required_skills, resume_content):
-        return [skill for skill in required_skills if skill.lower() in resume_content.lower()]
+        return get_skill_index(resume_content).match(required_skills)['matched']
 
     @staticmethod
     def generate_pdf_resume(html_content, user_name):
         try:
-            unique_id = uuid.uuid4().hex[:8]
-            filename = f"resume_{user_name.replace(' ', '_')}_{unique_id}.pdf"
-            output_path = os.path.join('app', 'generated_resumes', filename)
-            
-            with open(output_path, "w+b") as result_file:
-                pisa_status = pisa.CreatePDF(html_content, dest=result_file)
-            
-            if pisa_status.err:
-                logging.error(f"Error generating PDF: {pisa_status.err}")
-                return None
-            
-            return filename
+            # Rendered in the PDF worker pool, or deferred until first download/send in lazy mode
+            with span('render_pdf'):
+                return get_pdf_renderer().render(html_content, user_name)
         except Exception as e:
             logging.error(f"Error generating PDF resume: {str(e)}")
             return None
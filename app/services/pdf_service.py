@@ -0,0 +1,162 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from app.services.metrics import get_metrics
+
+GENERATED_RESUMES_DIR = os.path.join('app', 'generated_resumes')
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(os.cpu_count() or 2)))
+# Only render a PDF when it is downloaded or attached instead of right after generation
+LAZY_PDF_RENDERING = os.getenv("LAZY_PDF_RENDERING", "0") == "1"
+# Workers start from a clean interpreter: forking the server would copy its threads' locks and sockets mid-use
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def _warm_worker():
+    # Pay the xhtml2pdf/reportlab import once per worker process, not on its first render
+    from xhtml2pdf import pisa  # noqa: F401
+
+def _noop():
+    return None
+
+def _render_pdf(html_content, output_path):
+    """Runs in a worker process. Returns an error message, or None on success."""
+    from xhtml2pdf import pisa
+
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w+b") as result_file:
+        pisa_status = pisa.CreatePDF(html_content, dest=result_file)
+    if pisa_status.err:
+        os.remove(temp_path)
+        return f"xhtml2pdf reported {pisa_status.err} error(s)"
+    os.replace(temp_path, output_path)
+    return None
+
+class PDFRenderService:
+    """
+    Renders resume HTML to PDF in a pool of warm worker processes so xhtml2pdf does not hold the GIL
+    of the request or job threads. Filenames are derived from the HTML content hash, so identical
+    resumes are rendered once.
+    """
+
+    def __init__(self, workers=PDF_RENDER_WORKERS, output_dir=GENERATED_RESUMES_DIR, lazy=LAZY_PDF_RENDERING):
+        self.workers = workers
+        self.output_dir = output_dir
+        self.lazy = lazy
+        self._executor = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def filename_for(self, html_content, user_name):
+        digest = hashlib.sha256(html_content.encode('utf-8')).hexdigest()[:16]
+        return f"resume_{user_name.replace(' ', '_')}_{digest}.pdf"
+
+    def render(self, html_content, user_name):
+        """Return the PDF filename, rendering now or, in lazy mode, on first use."""
+        if self.lazy:
+            return self.register(html_content, user_name)
+        return self.submit(html_content, user_name).result()
+
+    def submit(self, html_content, user_name):
+        """Queue a render and return a Future that resolves to the filename, or None on failure."""
+        filename = self.filename_for(html_content, user_name)
+        if os.path.exists(os.path.join(self.output_dir, filename)):
+            future = Future()
+            future.set_result(filename)
+            return future
+        return self._submit_render(filename, html_content)
+
+    def submit_batch(self, items):
+        """Submit (html_content, user_name) pairs; returns futures in the same order."""
+        return [self.submit(html_content, user_name) for html_content, user_name in items]
+
+    def render_batch(self, items):
+        """render() for many (html_content, user_name) pairs at once; filenames come back in the same order."""
+        if self.lazy:
+            return [self.register(html_content, user_name) for html_content, user_name in items]
+        return [future.result() for future in self.submit_batch(items)]
+
+    def register(self, html_content, user_name):
+        """Keep the HTML next to where the PDF will go so ensure_rendered() can produce it on demand."""
+        filename = self.filename_for(html_content, user_name)
+        html_path = self._html_path(filename)
+        if not os.path.exists(html_path):
+            with open(html_path, "w", encoding="utf-8") as html_file:
+                html_file.write(html_content)
+        return filename
+
+    def is_available(self, filename):
+        """True when the PDF exists or can still be rendered from its registered HTML."""
+        return os.path.exists(os.path.join(self.output_dir, filename)) or os.path.exists(self._html_path(filename))
+
+    def ensure_rendered(self, filename):
+        """Render a lazily registered resume if its PDF is not on disk yet. Returns True once the PDF exists."""
+        filename = os.path.basename(filename)
+        if os.path.exists(os.path.join(self.output_dir, filename)):
+            return True
+
+        html_path = self._html_path(filename)
+        if not os.path.exists(html_path):
+            return False
+        with open(html_path, encoding="utf-8") as html_file:
+            html_content = html_file.read()
+        return self._submit_render(filename, html_content).result() is not None
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _submit_render(self, filename, html_content):
+        # Concurrent requests for the same content share one render
+        with self._lock:
+            if filename in self._in_flight:
+                return self._in_flight[filename]
+            future = Future()
+            self._in_flight[filename] = future
+            output_path = os.path.join(self.output_dir, filename)
+            submitted = time.perf_counter()
+            render_future = self._get_executor().submit(_render_pdf, html_content, output_path)
+
+        def on_rendered(render_future):
+            get_metrics().observe('pdf_render_seconds', time.perf_counter() - submitted)
+            with self._lock:
+                self._in_flight.pop(filename, None)
+            try:
+                error = render_future.result()
+            except Exception as e:
+                error = str(e)
+            if error:
+                logging.error(f"Error generating PDF {filename}: {error}")
+                future.set_result(None)
+            else:
+                future.set_result(filename)
+
+        render_future.add_done_callback(on_rendered)
+        return future
+
+    def _html_path(self, filename):
+        return os.path.join(self.output_dir, os.path.splitext(filename)[0] + '.html')
+
+    def _get_executor(self):
+        # Called with self._lock held
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                                 mp_context=multiprocessing.get_context(POOL_START_METHOD))
+            # Start every worker up front so the first batch does not pay process start-up
+            for _ in range(self.workers):
+                self._executor.submit(_noop)
+        return self._executor
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_pdf_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PDFRenderService()
+        return _renderer
@@ -0,0 +1,205 @@
+import os
+import re
+import logging
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Token budgets for each variable part of a prompt
+EMAIL_BODY_TOKENS = int(os.getenv("PROMPT_EMAIL_BODY_TOKENS", "1200"))
+CLASSIFIER_BODY_TOKENS = int(os.getenv("PROMPT_CLASSIFIER_BODY_TOKENS", "500"))
+RESUME_DIGEST_TOKENS = int(os.getenv("PROMPT_RESUME_TOKENS", "1500"))
+FIELD_TOKENS = int(os.getenv("PROMPT_FIELD_TOKENS", "300"))
+# Rough characters per token when tiktoken is not installed or its encoding cannot be loaded
+CHARS_PER_TOKEN = 4
+
+# A line that starts the quoted history of a reply or forward; everything from it on is dropped
+REPLY_MARKERS = [
+    re.compile(r"^On .{0,200}wrote:\s*$"),
+    re.compile(r"^-{2,}\s*(Original|Forwarded) Message\s*-{2,}", re.IGNORECASE),
+    re.compile(r"^From:\s.+$"),
+    re.compile(r"^_{10,}\s*$")
+]
+# A line that starts a legal footer or mailing-list boilerplate
+FOOTER_MARKERS = re.compile(
+    r"^\s*(confidentiality notice|this e-?mail (and any attachments )?(is|are|may be) confidential|"
+    r"this message (is intended|may contain)|disclaimer:|to unsubscribe|unsubscribe from|"
+    r"you are receiving this|sent from my (iphone|android|mobile))",
+    re.IGNORECASE
+)
+SIGNATURE_DELIMITER = re.compile(r"^--\s?$")
+
+# Resume sections in the order they are kept when the digest has to be cut
+DIGEST_SECTIONS = ['header', 'summary', 'profile', 'objective', 'skills', 'technical skills', 'core competencies',
+                   'experience', 'work experience', 'professional experience', 'employment', 'projects',
+                   'certifications', 'education', 'publications', 'awards', 'languages', 'volunteer', 'interests']
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+def load_encoding():
+    """
+    The gpt-4o tokenizer, or None when tiktoken is missing or its BPE file cannot be downloaded; the
+    character estimate is used then. Called at startup so the first prompt does not wait for the download.
+    """
+    global _encoding, _encoding_failed
+    if tiktoken is None:
+        return None
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                _encoding_failed = True
+                logging.error(f"Could not load the tiktoken encoding, estimating token counts instead: {e}")
+        return _encoding
+
+def count_tokens(text):
+    """Tokens in text with the gpt-4o tokenizer, or an estimate when it is not available."""
+    if not text:
+        return 0
+    encoding = load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text, budget):
+    """Cut text to at most budget tokens, preferring to end at a line or word break."""
+    if not text or count_tokens(text) <= budget:
+        return text
+    encoding = load_encoding()
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    else:
+        cut = text[:budget * CHARS_PER_TOKEN]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + " [...]"
+
+def clean_email_body(body):
+    """Drop quoted reply history, signatures and legal footers, and collapse runs of blank lines."""
+    lines = []
+    for line in (body or "").replace("\r\n", "\n").splitlines():
+        stripped = line.strip()
+        if stripped.startswith(">"):
+            continue
+        # The first message in a thread has no markers, so only cut once some text has been kept
+        if lines and (any(marker.match(stripped) for marker in REPLY_MARKERS) or SIGNATURE_DELIMITER.match(line)):
+            break
+        if FOOTER_MARKERS.match(stripped):
+            break
+        if not stripped and (not lines or not lines[-1]):
+            continue
+        lines.append(line.rstrip())
+    return "\n".join(lines).strip()
+
+class PromptMetrics:
+    """Token counts per prompt sent to the LLM, and per prompt part before and after compaction."""
+
+    def __init__(self):
+        self._prompts = {}
+        self._compaction = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, tokens):
+        with self._lock:
+            stats = self._prompts.setdefault(name, {'calls': 0, 'tokens': 0, 'max_tokens': 0})
+            stats['calls'] += 1
+            stats['tokens'] += tokens
+            stats['max_tokens'] = max(stats['max_tokens'], tokens)
+
+    def record_compaction(self, part, tokens_before, tokens_after):
+        with self._lock:
+            stats = self._compaction.setdefault(part, {'calls': 0, 'tokens_before': 0, 'tokens_after': 0})
+            stats['calls'] += 1
+            stats['tokens_before'] += tokens_before
+            stats['tokens_after'] += tokens_after
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'prompts': {name: dict(stats) for name, stats in self._prompts.items()},
+                'compaction': {part: dict(stats) for part, stats in self._compaction.items()}
+            }
+
+    def collect(self):
+        """Prompt token counters for the /metrics endpoint."""
+        snapshot = self.snapshot()
+        prompts = [({'prompt': name}, stats['tokens']) for name, stats in snapshot['prompts'].items()]
+        compaction = [
+            ({'part': part, 'stage': stage}, stats[f'tokens_{stage}'])
+            for part, stats in snapshot['compaction'].items() for stage in ('before', 'after')
+        ]
+        return [
+            ('prompt_tokens_total', 'counter', "Tokens of the prompts sent, counted locally.", prompts),
+            ('prompt_compaction_tokens_total', 'counter', "Tokens of prompt parts before and after compaction.",
+             compaction)
+        ]
+
+prompt_metrics = PromptMetrics()
+
+class PromptCompactor:
+    """Fits the variable parts of each prompt (email body, resume, extracted fields) into token budgets."""
+
+    @staticmethod
+    def email_body(body, budget=EMAIL_BODY_TOKENS):
+        compacted = truncate_to_tokens(clean_email_body(body), budget)
+        prompt_metrics.record_compaction('email_body', count_tokens(body), count_tokens(compacted))
+        return compacted
+
+    @staticmethod
+    def field(value, budget=FIELD_TOKENS):
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(value)
+        return truncate_to_tokens(value or "", budget)
+
+    @staticmethod
+    def resume_digest(user_profile):
+        """Compact resume text for prompts, computed once per UserProfile."""
+        if user_profile.digest is None:
+            user_profile.digest = PromptCompactor.build_digest(user_profile.resume_content, user_profile.sections)
+            prompt_metrics.record_compaction('resume', count_tokens(user_profile.resume_content),
+                                             count_tokens(user_profile.digest))
+        return user_profile.digest
+
+    @staticmethod
+    def build_digest(resume_content, sections, budget=RESUME_DIGEST_TOKENS):
+        """Resume with whitespace collapsed; over budget, the least relevant sections are cut first."""
+        text = PromptCompactor._squeeze(resume_content)
+        if count_tokens(text) <= budget or not sections:
+            return truncate_to_tokens(text, budget)
+
+        parts = []
+        remaining = budget
+        ordered = [heading for heading in DIGEST_SECTIONS if heading in sections]
+        ordered += [heading for heading in sections if heading not in ordered]
+        for heading in ordered:
+            section = PromptCompactor._squeeze(sections[heading])
+            if heading != 'header':
+                section = f"{heading.title()}:\n{section}"
+            tokens = count_tokens(section)
+            if tokens > remaining:
+                if remaining > FIELD_TOKENS // 2:
+                    parts.append(truncate_to_tokens(section, remaining))
+                break
+            parts.append(section)
+            remaining -= tokens
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def record(name, prompt):
+        """Count the tokens of a prompt about to be sent under the given name."""
+        prompt_metrics.record(name, count_tokens(prompt))
+
+    @staticmethod
+    def _squeeze(text):
+        lines = [re.sub(r"[ \t]+", " ", line).strip() for line in (text or "").splitlines()]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+def get_prompt_metrics():
+    return prompt_metrics
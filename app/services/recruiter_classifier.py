@@ -0,0 +1,113 @@
+import re
+import threading
+from email.utils import parseaddr
+
+# Define recruiter-related keywords or domains
+RECRUITER_KEYWORDS = ['recruiter', 'recruiting', 'hiring', 'opportunity', 'position', 'job', 'role',
+                      'talent acquisition', 'your background', 'your experience', 'interview', 'contract role',
+                      'full-time', 'compensation']
+RECRUITER_DOMAINS = ['greenhouse.io', 'lever.co', 'myworkday.com', 'smartrecruiters.com', 'icims.com',
+                     'jobvite.com', 'ashbyhq.com', 'workablemail.com', 'hired.com', 'dice.com']
+
+# Signals of automated or bulk mail that is not a personal recruiter outreach
+BULK_KEYWORDS = ['unsubscribe', 'newsletter', 'job alert', 'jobs you may be interested in', 'webinar',
+                 'receipt', 'invoice', 'order confirmation', 'verify your email', 'password reset']
+BULK_SENDER_PREFIXES = ['noreply', 'no-reply', 'donotreply', 'do-not-reply', 'notifications', 'alerts', 'newsletter']
+
+# Scores at or above ACCEPT_SCORE are recruiter emails, at or below REJECT_SCORE are not; anything
+# in between is left to the LLM. Rejecting needs negative evidence (bulk headers, noreply senders,
+# bulk keywords), not just the absence of recruiter keywords
+ACCEPT_SCORE = 5
+REJECT_SCORE = -2
+# A sender the LLM rejected before counts against their next message instead of deciding it
+HISTORY_REJECT_PENALTY = 2
+
+def _keyword_patterns(keywords):
+    # Whole words only: 'role' must not match 'payroll', nor 'position' 'composition'
+    return [re.compile(r'\b' + re.escape(keyword) + r'\b') for keyword in keywords]
+
+RECRUITER_PATTERNS = _keyword_patterns(RECRUITER_KEYWORDS)
+BULK_PATTERNS = _keyword_patterns(BULK_KEYWORDS)
+
+class RecruiterClassifier:
+    """Local scorer that decides clear-cut recruiter emails without an LLM call."""
+
+    def __init__(self):
+        # Sender address -> verdict from earlier messages
+        self.sender_history = {}
+        self.stats = {'history': 0, 'local_accept': 0, 'local_reject': 0, 'llm': 0}
+        self._lock = threading.Lock()
+
+    def classify(self, sender, subject, body, bulk=False, accept_needs_llm=False):
+        """
+        Return True/False for a confident local decision, or None when the email needs the LLM. Set
+        accept_needs_llm when accepted emails go to the LLM anyway (unified extraction), so accepts are
+        counted as LLM calls rather than avoided ones.
+        """
+        verdict, tier = self._decide(parseaddr(sender or '')[1].lower(), subject or '', body or '', bulk)
+        self._count('llm' if verdict is True and accept_needs_llm else tier)
+        return verdict
+
+    def _decide(self, address, subject, body, bulk):
+        with self._lock:
+            known = self.sender_history.get(address)
+        if known:
+            return True, 'history'
+
+        score = self.score(address, subject, body, bulk)
+        if known is False:
+            score -= HISTORY_REJECT_PENALTY
+        if score >= ACCEPT_SCORE:
+            return True, 'local_accept'
+        if score <= REJECT_SCORE:
+            return False, 'local_reject'
+        return None, 'llm'
+
+    def score(self, address, subject, body, bulk=False):
+        subject = subject.lower()
+        body = body.lower()
+        local_part, _, domain = address.partition('@')
+
+        score = 0
+        score += 2 * sum(1 for pattern in RECRUITER_PATTERNS if pattern.search(subject))
+        score += sum(1 for pattern in RECRUITER_PATTERNS if pattern.search(body))
+        if any(domain == d or domain.endswith('.' + d) for d in RECRUITER_DOMAINS):
+            score += 3
+
+        score -= 3 * sum(1 for pattern in BULK_PATTERNS if pattern.search(subject))
+        score -= sum(1 for pattern in BULK_PATTERNS if pattern.search(body))
+        if any(local_part.startswith(prefix) for prefix in BULK_SENDER_PREFIXES):
+            score -= 2
+        if bulk:
+            score -= 2
+
+        return score
+
+    def record(self, sender, is_recruiter):
+        """Remember the verdict for a sender: accepted senders' next messages are accepted locally."""
+        address = parseaddr(sender or '')[1].lower()
+        if address:
+            with self._lock:
+                self.sender_history[address] = is_recruiter
+
+    def hit_rates(self):
+        """Share of messages decided by each tier, plus the share of LLM calls avoided."""
+        with self._lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
+        if not total:
+            return {tier: 0.0 for tier in list(stats) + ['llm_avoided']}
+        rates = {tier: count / total for tier, count in stats.items()}
+        rates['llm_avoided'] = 1 - rates['llm']
+        return rates
+
+    def collect(self):
+        """Decisions per tier for the /metrics endpoint."""
+        with self._lock:
+            stats = dict(self.stats)
+        samples = [({'tier': tier}, count) for tier, count in stats.items()]
+        return [('recruiter_classifier_decisions_total', 'counter', "Recruiter classification decisions by tier.", samples)]
+
+    def _count(self, tier):
+        with self._lock:
+            self.stats[tier] += 1
@@ -0,0 +1,269 @@
+import os
+import re
+import time
+import heapq
+import random
+import logging
+import threading
+import itertools
+import contextvars
+from contextlib import contextmanager
+from googleapiclient.errors import HttpError
+import openai
+from app.services.metrics import get_metrics
+
+# Lower numbers are served first when callers are waiting for the same limit
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+# Gmail allows 250 quota units per user per second
+GMAIL_QUOTA_UNITS_PER_SECOND = int(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "250"))
+MAX_RETRIES = int(os.getenv("REQUEST_MAX_RETRIES", "5"))
+BASE_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+# Quota units charged by Gmail per method
+GMAIL_QUOTA_UNITS = {
+    'messages.list': 5,
+    'messages.get': 5,
+    'messages.send': 100,
+    'history.list': 2,
+    'getProfile': 1
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Priority of the calls made in the current context; copied into worker threads by Metrics.in_context
+_priority = contextvars.ContextVar('request_priority', default=PRIORITY_INTERACTIVE)
+GMAIL_RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, cost):
+        """Seconds until cost tokens are available; 0 means they were taken."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Requests larger than the bucket (a big Gmail batch) go through once it is full
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def limit_remaining(self, remaining):
+        self.tokens = min(self.tokens, remaining)
+
+class RequestScheduler:
+    """
+    Central gate for OpenAI and Gmail calls: token-bucket limits per model and for Gmail quota units,
+    a priority queue so interactive work goes ahead of bulk work, and retries with exponential backoff
+    and jitter that honor Retry-After and the x-ratelimit-* headers returned by OpenAI.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+        self.buckets = {'gmail': TokenBucket(GMAIL_QUOTA_UNITS_PER_SECOND, GMAIL_QUOTA_UNITS_PER_SECOND)}
+        self._waiting = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def priority(self, priority):
+        """Run the calls made inside the block, and by tasks it starts with in_context, at the given priority."""
+        token = _priority.set(priority)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    def call(self, bucket, fn, *args, cost=1, idempotent=True, **kwargs):
+        """
+        Call fn once the bucket allows it, retrying rate-limit and transient errors. Calls that must not run
+        twice (sending mail, starting a paid batch) pass idempotent=False: a 5xx or dropped connection may
+        come after the call took effect, so only rate-limit rejections are retried for them.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(bucket, cost)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, idempotent)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                logging.warning(f"Retrying {bucket} call in {delay:.1f}s after: {e}")
+                if self.is_rate_limited(e):
+                    with self._condition:
+                        self._bucket(bucket).pause(delay)
+                time.sleep(delay)
+
+    def chat_completion(self, client, **kwargs):
+        """client.chat.completions.create(**kwargs), limited per model and updated from the response headers."""
+        model = kwargs.get('model', 'default')
+        completions = client.chat.completions
+
+        try:
+            if not hasattr(completions, 'with_raw_response'):
+                response = self.call(model, completions.create, **kwargs)
+            else:
+                raw_response = self.call(model, completions.with_raw_response.create, **kwargs)
+                self.update_from_headers(model, raw_response.headers)
+                response = raw_response.parse()
+        except Exception:
+            get_metrics().inc('openai_requests_total', model=model, outcome='error')
+            raise
+        get_metrics().inc('openai_requests_total', model=model, outcome='ok')
+        if not kwargs.get('stream'):
+            record_usage(model, getattr(response, 'usage', None))
+        return response
+
+    def stream_completion(self, client, on_delta, **kwargs):
+        """Streaming chat_completion: on_delta receives each piece of text as it arrives; returns the full text."""
+        parts = []
+        # The last chunk then carries the token usage of the whole completion
+        kwargs.setdefault('stream_options', {'include_usage': True})
+        for chunk in self.chat_completion(client, stream=True, **kwargs):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+            if getattr(chunk, 'usage', None):
+                record_usage(kwargs.get('model', 'default'), chunk.usage)
+        return "".join(parts)
+
+    def execute(self, request, cost, idempotent=True):
+        """request.execute() for a Gmail API request or batch, charged cost quota units."""
+        # A batch has no methodId and counts as one request; its cost covers every call inside it
+        method = getattr(request, 'methodId', None) or 'batch'
+        get_metrics().inc('gmail_requests_total', method=method.replace('gmail.users.', ''))
+        get_metrics().inc('gmail_quota_units_total', cost)
+        return self.call('gmail', request.execute, cost=cost, idempotent=idempotent)
+
+    def acquire(self, bucket, cost=1):
+        entry = (_priority.get(), next(self._sequence))
+        with self._condition:
+            waiting = self._waiting.setdefault(bucket, [])
+            heapq.heappush(waiting, entry)
+            try:
+                while True:
+                    # Only the most urgent waiter may take tokens from this bucket
+                    if waiting[0] == entry:
+                        delay = self._bucket(bucket).wait_time(cost)
+                        if delay == 0:
+                            return
+                    else:
+                        delay = None
+                    self._condition.wait(delay)
+            finally:
+                waiting.remove(entry)
+                heapq.heapify(waiting)
+                self._condition.notify_all()
+
+    def update_from_headers(self, bucket, headers):
+        """Apply x-ratelimit-remaining-requests / x-ratelimit-reset-requests from an OpenAI response."""
+        remaining = headers.get('x-ratelimit-remaining-requests')
+        if remaining is None:
+            return
+        with self._condition:
+            limiter = self._bucket(bucket)
+            limiter.limit_remaining(int(remaining))
+            if int(remaining) == 0:
+                limiter.pause(parse_duration(headers.get('x-ratelimit-reset-requests', '1s')))
+
+    def retry_delay(self, error, attempt, idempotent=True):
+        """Seconds to wait before retrying error, or None if it should not be retried."""
+        if not self.is_retryable(error):
+            return None
+        # A rate-limit rejection means the call was not carried out; anything else may have been
+        if not idempotent and not self.is_rate_limited(error):
+            return None
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_DELAY)
+        return self.backoff(attempt)
+
+    @staticmethod
+    def backoff(attempt):
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(MAX_RETRY_DELAY, BASE_RETRY_DELAY * (2 ** attempt)))
+
+    @staticmethod
+    def is_retryable(error):
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+            return True
+        if isinstance(error, HttpError):
+            return error.resp.status in RETRYABLE_STATUS_CODES or RequestScheduler.is_rate_limited(error)
+        return False
+
+    @staticmethod
+    def is_rate_limited(error):
+        if isinstance(error, openai.RateLimitError):
+            return True
+        if isinstance(error, HttpError):
+            if error.resp.status == 429:
+                return True
+            return error.resp.status == 403 and any(reason in str(error.content) for reason in GMAIL_RATE_LIMIT_REASONS)
+        return False
+
+    @staticmethod
+    def _retry_after(error):
+        headers = None
+        if isinstance(error, openai.APIStatusError):
+            headers = error.response.headers
+        elif isinstance(error, HttpError):
+            headers = error.resp
+        if not headers:
+            return None
+        try:
+            if headers.get('retry-after-ms'):
+                return float(headers['retry-after-ms']) / 1000
+            if headers.get('retry-after'):
+                return float(headers['retry-after'])
+        except ValueError:
+            return None
+        return None
+
+    def _bucket(self, name):
+        if name not in self.buckets:
+            rate = OPENAI_REQUESTS_PER_MINUTE / 60
+            # Allow short bursts of up to a tenth of the per-minute limit
+            self.buckets[name] = TokenBucket(rate, max(1, OPENAI_REQUESTS_PER_MINUTE // 10))
+        return self.buckets[name]
+
+def parse_duration(value):
+    """Parse OpenAI reset durations such as '20ms', '1s' or '6m0s' into seconds."""
+    seconds = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value or ''):
+        seconds += float(amount) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+    return seconds or 1.0
+
+def record_usage(model, usage):
+    """Add the token counts of an OpenAI usage object (or the equivalent dict) to the metrics."""
+    if not usage:
+        return
+    if not isinstance(usage, dict):
+        usage = {'prompt_tokens': usage.prompt_tokens, 'completion_tokens': usage.completion_tokens}
+    for kind in ('prompt', 'completion'):
+        get_metrics().inc('openai_tokens_total', usage.get(f'{kind}_tokens') or 0, model=model, type=kind)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Process-wide scheduler shared by every OpenAI and Gmail call."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
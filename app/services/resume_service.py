@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader
+from app.models.email_model import UserProfile
+from app.services.prompt_compactor import PromptCompactor
+from app.services.pdf_service import POOL_START_METHOD
+
+RESUME_CACHE_DIR = os.getenv("RESUME_CACHE_DIR", os.path.join('app', 'cache', 'resumes'))
+# Documents with at least this many pages are split across worker processes
+PARALLEL_PAGE_THRESHOLD = 8
+EXTRACTION_WORKERS = int(os.getenv("RESUME_EXTRACTION_WORKERS", str(os.cpu_count() or 2)))
+
+SECTION_HEADINGS = ['summary', 'profile', 'objective', 'experience', 'work experience', 'professional experience',
+                    'employment', 'education', 'skills', 'technical skills', 'core competencies', 'projects',
+                    'certifications', 'awards', 'publications', 'volunteer', 'languages', 'interests']
+SKILL_SECTIONS = ['skills', 'technical skills', 'core competencies']
+
+def _extract_pages(pdf_path, start, stop):
+    """Runs in a worker process: text of pages [start, stop)."""
+    reader = PdfReader(pdf_path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+class ResumeService:
+    """Extracts resume text once per distinct file and keeps a pre-parsed UserProfile for reuse."""
+
+    def __init__(self, cache_dir=RESUME_CACHE_DIR, workers=EXTRACTION_WORKERS):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def load_profile(self, name, email, pdf_path):
+        """Build a UserProfile for the uploaded PDF, reusing the parsed text when the same file was seen before."""
+        digest = self.file_hash(pdf_path)
+        profile = self.load_cached_profile(digest, name, email)
+        if profile:
+            return profile
+
+        resume_content = self.extract_text(pdf_path)
+        sections = self.split_sections(resume_content)
+        profile = UserProfile(name, email, resume_content, sections=sections, skills=self.extract_skills(sections),
+                              resume_hash=digest)
+        PromptCompactor.resume_digest(profile)
+        self._write_cache(digest, profile)
+        return profile
+
+    def load_cached_profile(self, digest, name, email):
+        """Reload a previously parsed resume by its content hash without touching the PDF."""
+        cache_path = self._cache_path(digest)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read cached resume {digest}: {e}")
+            return None
+        data.update(name=name, email=email)
+        return UserProfile.from_dict(data)
+
+    @staticmethod
+    def file_hash(pdf_path):
+        sha256 = hashlib.sha256()
+        with open(pdf_path, 'rb') as pdf_file:
+            for chunk in iter(lambda: pdf_file.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def extract_text(self, pdf_path):
+        page_count = len(PdfReader(pdf_path).pages)
+        if page_count < PARALLEL_PAGE_THRESHOLD or self.workers < 2:
+            return "".join(_extract_pages(pdf_path, 0, page_count))
+
+        # Each worker parses its own contiguous range of pages
+        chunk_size = -(-page_count // self.workers)
+        ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+        chunks = self._get_executor().map(_extract_pages, [pdf_path] * len(ranges), *zip(*ranges))
+        return "".join(text for chunk in chunks for text in chunk)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _get_executor(self):
+        # One pool for every large upload, started on the first one
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context(POOL_START_METHOD))
+            return self._executor
+
+    @staticmethod
+    def split_sections(resume_content):
+        """Map lower-cased section headings to their text; text before the first heading goes under 'header'."""
+        sections = {}
+        current = 'header'
+        lines = []
+        for line in resume_content.splitlines():
+            heading = line.strip().rstrip(':').lower()
+            if heading in SECTION_HEADINGS:
+                if lines:
+                    sections[current] = "\n".join(lines).strip()
+                current, lines = heading, []
+            else:
+                lines.append(line)
+        if lines:
+            sections[current] = "\n".join(lines).strip()
+        return sections
+
+    @staticmethod
+    def extract_skills(sections):
+        skills = []
+        for heading in SKILL_SECTIONS:
+            for item in re.split(r'[,;|•\n]', sections.get(heading, '')):
+                # Drop "Languages:"-style labels in front of the actual skills
+                item = item.split(':')[-1].strip(' -*\t')
+                if item and item.lower() not in (skill.lower() for skill in skills):
+                    skills.append(item)
+        return skills
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _write_cache(self, digest, profile):
+        data = profile.to_dict()
+        # Name and email come from the form on every upload, only the parsed resume is cached
+        del data['name'], data['email']
+        temp_path = self._cache_path(digest) + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump(data, cache_file)
+        os.replace(temp_path, self._cache_path(digest))
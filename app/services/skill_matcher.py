@@ -0,0 +1,172 @@
+import re
+import hashlib
+import threading
+from collections import deque, OrderedDict
+
+# Tokens keep the symbols that matter in skill names (C++, C#, Node.js, .NET); a leading dot is kept so
+# '.NET' does not match 'net revenue'
+TOKEN_PATTERN = re.compile(r"\.?[a-z0-9#+][a-z0-9#+.\-]*")
+
+# Abbreviation -> the phrase it stands for; both sides of a match are expanded the same way
+SKILL_SYNONYMS = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'golang': 'go',
+    'k8s': 'kubernetes',
+    'postgres': 'postgresql',
+    'nodejs': 'node.js',
+    'dotnet': '.net',
+    'reactjs': 'react',
+    'py': 'python',
+    'ml': 'machine learning',
+    'ai': 'artificial intelligence',
+    'nlp': 'natural language processing',
+    'aws': 'amazon web services',
+    'gcp': 'google cloud platform',
+    'o365': 'office 365',
+    'm365': 'microsoft 365',
+}
+
+# Number of resumes whose token index is kept in memory
+INDEX_CACHE_SIZE = 16
+
+def stem(token):
+    """Light suffix stripping so 'APIs', 'scripting' and 'scripted' match 'API' and 'script'."""
+    if not token.isalpha() or len(token) <= 3:
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('ing') and len(token) > 5:
+        return token[:-3]
+    if token.endswith('ed') and len(token) > 4:
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def _expand(word):
+    return SKILL_SYNONYMS.get(word, word).split()
+
+def tokenize(text):
+    """Return (normalized_token, start, end) triples; abbreviations expand to several tokens sharing one span."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        word = match.group().rstrip('.-')
+        if not word:
+            continue
+        end = match.start() + len(word)
+        for part in _expand(word):
+            tokens.append((stem(part), match.start(), end))
+    return tokens
+
+def skill_key(skill):
+    """Normalized token sequence a skill name is matched by."""
+    return tuple(token for token, _, _ in tokenize(skill))
+
+class _Automaton:
+    """Aho-Corasick automaton over token sequences."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern in patterns:
+            state = 0
+            for token in pattern:
+                if token not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][token] = len(self.goto) - 1
+                state = self.goto[state][token]
+            self.output[state].append(pattern)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(token, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, tokens):
+        """Yield (pattern, first_token_index, last_token_index) for every occurrence."""
+        state = 0
+        for index, token in enumerate(tokens):
+            while state and token not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(token, 0)
+            for pattern in self.output[state]:
+                yield pattern, index - len(pattern) + 1, index
+
+class SkillIndex:
+    """Resume tokenized and normalized once; required skills are matched against it in a single pass."""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self._words = [token for token, _, _ in self.tokens]
+        # First and last token index of the word each token came from; an abbreviation such as 'gcp'
+        # expands to several tokens that share the word's span
+        self._word_first = []
+        for index, (_, start, end) in enumerate(self.tokens):
+            same_word = index and self.tokens[index - 1][1:] == (start, end)
+            self._word_first.append(self._word_first[-1] if same_word else index)
+        self._word_last = [0] * len(self.tokens)
+        for index in reversed(range(len(self.tokens))):
+            same_word = index + 1 < len(self.tokens) and self.tokens[index + 1][1:] == self.tokens[index][1:]
+            self._word_last[index] = self._word_last[index + 1] if same_word else index
+
+    def match_many(self, skill_lists):
+        """
+        Match several required-skill lists (one per email) with one automaton and one scan of the resume.
+        Returns one result per list: {'score', 'matched', 'missing', 'skills': {skill: {'count', 'positions'}}}.
+        """
+        keys = {skill: skill_key(skill) for skills in skill_lists for skill in skills}
+        positions = {key: [] for key in keys.values() if key}
+        for pattern, first, last in _Automaton(positions).search(self._words):
+            # Part of an expansion is not a match: 'Google' must not match inside 'GCP'
+            if self._word_first[first] != first or self._word_last[last] != last:
+                continue
+            span = (self.tokens[first][1], self.tokens[last][2])
+            if not positions[pattern] or positions[pattern][-1] != span:
+                positions[pattern].append(span)
+
+        results = []
+        for skills in skill_lists:
+            details = {}
+            for skill in skills:
+                spans = positions.get(keys[skill], [])
+                details[skill] = {'count': len(spans), 'positions': spans}
+            matched = [skill for skill in skills if details[skill]['count']]
+            results.append({
+                'score': len(matched) / len(skills) if skills else 0.0,
+                'matched': matched,
+                'missing': [skill for skill in skills if not details[skill]['count']],
+                'skills': details
+            })
+        return results
+
+    def match(self, skills):
+        return self.match_many([skills])[0]
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+def get_skill_index(text):
+    """SkillIndex for text, reused while it stays among the INDEX_CACHE_SIZE most recent resumes."""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    with _index_cache_lock:
+        if digest in _index_cache:
+            _index_cache.move_to_end(digest)
+            return _index_cache[digest]
+
+    index = SkillIndex(text)
+    with _index_cache_lock:
+        _index_cache[digest] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
@@ -0,0 +1,82 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+
+# Finished streams kept for late or reconnecting subscribers
+MAX_CLOSED_STREAMS = int(os.getenv("MAX_CLOSED_STREAMS", "200"))
+# Seconds a subscriber waits for new output before checking whether the stream is gone
+FOLLOW_TIMEOUT = 15
+
+class StreamHub:
+    """
+    In-process fan-out of partial LLM output. Producers publish (event, data) pairs to a stream ID;
+    subscribers get everything published so far, then live events until the stream is closed.
+    """
+
+    def __init__(self, max_closed=MAX_CLOSED_STREAMS):
+        self.max_closed = max_closed
+        self._streams = OrderedDict()
+        self._condition = threading.Condition()
+
+    def create(self):
+        stream_id = uuid.uuid4().hex
+        with self._condition:
+            self._streams[stream_id] = {'events': [], 'closed': False}
+        return stream_id
+
+    def exists(self, stream_id):
+        with self._condition:
+            return stream_id in self._streams
+
+    def publish(self, stream_id, event, data):
+        with self._condition:
+            stream = self._streams.get(stream_id)
+            if stream is None or stream['closed']:
+                return
+            stream['events'].append((event, data))
+            self._condition.notify_all()
+
+    def close(self, stream_id, event='done', data=None):
+        with self._condition:
+            stream = self._streams.get(stream_id)
+            if stream is None or stream['closed']:
+                return
+            stream['events'].append((event, data or {}))
+            stream['closed'] = True
+            self._streams.move_to_end(stream_id)
+            self._condition.notify_all()
+            self._evict()
+
+    def follow(self, stream_id):
+        """Yield (event, data) pairs for stream_id from the beginning; ends once the stream is closed."""
+        seen = 0
+        while True:
+            with self._condition:
+                stream = self._streams.get(stream_id)
+                if stream is None:
+                    return
+                if seen == len(stream['events']) and not stream['closed']:
+                    self._condition.wait(FOLLOW_TIMEOUT)
+                    continue
+                events = stream['events'][seen:]
+                closed = stream['closed']
+            seen += len(events)
+            yield from events
+            if closed:
+                return
+
+    def _evict(self):
+        closed = [stream_id for stream_id, stream in self._streams.items() if stream['closed']]
+        for stream_id in closed[:max(0, len(closed) - self.max_closed)]:
+            del self._streams[stream_id]
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_stream_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = StreamHub()
+        return _hub
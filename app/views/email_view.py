@@ -1,19 +1,73 @@
-from flask import render_template, send_from_directory, jsonify
+from flask import render_template, send_from_directory, jsonify, Response, stream_with_context
 import os
+import json
+from app.services.pdf_service import get_pdf_renderer
 
 class EmailView:
     @staticmethod
     def render_dashboard(processed_emails, user_profile):
         return render_template('dashboard.html', emails=processed_emails, user=user_profile)
 
+    @staticmethod
+    def render_job_dashboard(job_id, user_name):
+        return render_template('dashboard.html', emails=[], user={'name': user_name}, job_id=job_id)
+
+    @staticmethod
+    def render_email_page(processed_emails, total, page, per_page, filters):
+        pagination = {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': max(1, -(-total // per_page)),
+            'filters': {key: value for key, value in filters.items() if value}
+        }
+        return render_template('dashboard.html', emails=processed_emails, user={}, pagination=pagination)
+
+    @staticmethod
+    def render_email_page_json(processed_emails, total, page, per_page):
+        return jsonify({
+            'emails': [processed_email.to_dict() for processed_email in processed_emails],
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        })
+
+    @staticmethod
+    def render_job(job):
+        return jsonify(job)
+
+    @staticmethod
+    def stream_job(events):
+        """Server-Sent Events stream of (event, data) pairs from JobQueue.follow() or StreamHub.follow()."""
+        def generate():
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+
+    @staticmethod
+    def render_trace(trace):
+        return jsonify(trace)
+
+    @staticmethod
+    def render_metrics(text):
+        # Prometheus text exposition format
+        return Response(text, content_type='text/plain; version=0.0.4; charset=utf-8')
+
     @staticmethod
     def render_profile_form():
         return render_template('profile_form.html')
 
     @staticmethod
     def download_resume(filename):
+        # Lazily registered resumes are rendered on first download
+        get_pdf_renderer().ensure_rendered(filename)
         return send_from_directory(os.path.join('app', 'generated_resumes'), filename, as_attachment=True)
 
     @staticmethod
-    def render_email_sent(success):
-        return jsonify({"success": success})
+    def render_email_sent(results):
+        """results maps message IDs to an error message, or None for each email that was sent."""
+        return jsonify({
+            "success": all(error is None for error in results.values()),
+            "results": {message_id: {"sent": error is None, "error": error} for message_id, error in results.items()}
+        })
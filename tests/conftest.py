@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Services build an OpenAI client and open the LLM cache when they are created; keep the cache out of
+# the working tree
+_data_dir = tempfile.mkdtemp(prefix='recruiter-tests-')
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_data_dir, 'llm_cache.sqlite3'))
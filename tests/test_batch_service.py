@@ -0,0 +1,63 @@
+import uuid
+
+import httpx
+import pytest
+from openai import OpenAI
+
+from app.services import batch_service
+from app.services.batch_service import BatchTailoringService
+from app.services.gmail_service import GmailService
+from app.services.job_queue import JobDeferred
+from app.services.pdf_service import PDFRenderService
+from app.models.email_model import Email, UserProfile
+from tools import mock_openai_server
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    """OpenAI client talking to tools/mock_openai_server.py in-process, with its batches cleared."""
+    monkeypatch.setattr(mock_openai_server, 'batches', {})
+    monkeypatch.setattr(mock_openai_server, 'BATCH_POLLS', 0)
+    http_client = httpx.Client(transport=httpx.WSGITransport(app=mock_openai_server.app))
+    return OpenAI(api_key='mock', base_url='http://mock/v1', http_client=http_client, max_retries=0)
+
+@pytest.fixture
+def service(mock_api, monkeypatch, tmp_path):
+    # Lazy rendering only writes the HTML, so no PDF worker processes are started
+    renderer = PDFRenderService(output_dir=str(tmp_path), lazy=True)
+    monkeypatch.setattr(batch_service, 'get_pdf_renderer', lambda: renderer)
+    return BatchTailoringService(GmailService(), client=mock_api, batch_dir=str(tmp_path / 'batches'), poll_interval=30)
+
+@pytest.fixture
+def user_profile():
+    return UserProfile('Ada Lovelace', 'ada@example.com', "# Ada Lovelace\n\n## Skills\n\n- Python\n- AWS\n")
+
+def recruiter_emails(count):
+    # Fresh message IDs keep the LLM cache from answering for emails another test already ran
+    return [
+        Email(f"m-{uuid.uuid4().hex}", f"Backend role {i}", 'recruiter@example.com', body="We are hiring.",
+              job_description='Backend engineer', required_skills=['Python'])
+        for i in range(count)
+    ]
+
+def test_run_collects_completed_batch(service, user_profile):
+    emails = recruiter_emails(2)
+
+    processed_emails = service.run(emails, user_profile)
+
+    assert [processed.original_email.message_id for processed in processed_emails] == [e.message_id for e in emails]
+    assert all(processed.response_email.body == mock_openai_server.MOCK_RESPONSE for processed in processed_emails)
+    assert len(mock_openai_server.batches) == 1
+
+def test_running_batch_defers_and_resumes_without_resubmitting(service, user_profile, monkeypatch):
+    monkeypatch.setattr(mock_openai_server, 'BATCH_POLLS', 1)
+    emails = recruiter_emails(2)
+
+    with pytest.raises(JobDeferred) as deferred:
+        service.run(emails, user_profile)
+
+    checkpoint = deferred.value.checkpoint
+    assert deferred.value.delay == 30
+    assert checkpoint['message_ids'] == [email.message_id for email in emails]
+    processed_emails = service.resume(checkpoint['batch_id'], emails, user_profile)
+    assert len(processed_emails) == 2
+    assert list(mock_openai_server.batches) == [checkpoint['batch_id']]
@@ -0,0 +1,105 @@
+import json
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+from googleapiclient.http import HttpMockSequence
+
+from app.services.gmail_service import GmailService
+
+BOUNDARY = 'batch_boundary'
+
+class RecordingHttp(HttpMockSequence):
+    """HttpMockSequence that also keeps every request, so tests can check what was asked for."""
+
+    def __init__(self, iterable):
+        super().__init__(iterable)
+        self.requests = []
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=1, connection_type=None):
+        self.requests.append((uri, body.decode('utf-8') if isinstance(body, bytes) else body))
+        return super().request(uri, method, body, headers, redirections, connection_type)
+
+def json_response(body):
+    return {'status': '200'}, json.dumps(body)
+
+def batch_response(parts):
+    """Gmail batch reply; parts are (message_id, status, body) for each call in the batch."""
+    chunks = []
+    for message_id, status, body in parts:
+        chunks.append(
+            f"--{BOUNDARY}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <response-batch + {message_id}>\r\n\r\n"
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            "Content-Type: application/json\r\n\r\n"
+            f"{json.dumps(body)}\r\n"
+        )
+    chunks.append(f"--{BOUNDARY}--\r\n")
+    return {'status': '200', 'content-type': f'multipart/mixed; boundary={BOUNDARY}'}, "".join(chunks)
+
+def message(message_id):
+    return {'id': message_id, 'payload': {'headers': [{'name': 'Subject', 'value': f"Role {message_id}"}]}}
+
+def error(status, reason):
+    return {'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}}
+
+@pytest.fixture
+def gmail(monkeypatch):
+    def build(responses):
+        http = RecordingHttp(responses)
+        service = GmailService(http=http)
+        # Rate-limited calls are retried straight away instead of after a real backoff
+        monkeypatch.setattr(service.scheduler, 'backoff', lambda attempt: 0)
+        return service, http
+    return build
+
+def test_list_message_ids_follows_next_page_token(gmail):
+    service, http = gmail([
+        json_response({'messages': [{'id': 'm1'}, {'id': 'm2'}], 'nextPageToken': 'page-2'}),
+        json_response({'messages': [{'id': 'm3'}]}),
+    ])
+
+    message_ids = service.list_message_ids(service.get_service(), 'me', 'subject:job', 10)
+
+    assert message_ids == ['m1', 'm2', 'm3']
+    first, second = (parse_qs(urlparse(uri).query) for uri, _ in http.requests)
+    assert 'pageToken' not in first
+    assert second['pageToken'] == ['page-2']
+    assert second['maxResults'] == ['8']
+
+def test_list_message_ids_stops_at_max_results(gmail):
+    service, http = gmail([
+        json_response({'messages': [{'id': 'm1'}, {'id': 'm2'}], 'nextPageToken': 'page-2'}),
+    ])
+
+    assert service.list_message_ids(service.get_service(), 'me', 'subject:job', 2) == ['m1', 'm2']
+    assert len(http.requests) == 1
+
+def test_fetch_messages_refetches_only_rate_limited_items(gmail):
+    service, http = gmail([
+        batch_response([
+            ('m1', 200, message('m1')),
+            ('m2', 429, error(429, 'rateLimitExceeded')),
+            ('m3', 404, error(404, 'notFound')),
+        ]),
+        batch_response([('m2', 200, message('m2'))]),
+    ])
+    gone = []
+
+    messages = service.fetch_messages(service.get_service(), 'me', ['m1', 'm2', 'm3'], gone)
+
+    assert [msg['id'] for msg in messages] == ['m1', 'm2']
+    assert gone == ['m3']
+    assert len(http.requests) == 2
+    _, retry_body = http.requests[1]
+    assert '/messages/m2' in retry_body
+    assert '/messages/m1' not in retry_body and '/messages/m3' not in retry_body
+
+def test_fetch_messages_keeps_list_order(gmail):
+    service, _ = gmail([
+        batch_response([('m2', 200, message('m2')), ('m1', 200, message('m1'))]),
+    ])
+
+    messages = service.fetch_messages(service.get_service(), 'me', ['m1', 'm2'])
+
+    assert [msg['id'] for msg in messages] == ['m1', 'm2']
@@ -0,0 +1,31 @@
+import time
+
+from app.services.job_queue import JobQueue, JobDeferred
+
+def wait_for_status(jobs, job_id, status, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get_job(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not reach {status}")
+
+def test_deferred_job_runs_again_with_its_checkpoint(tmp_path):
+    payloads = []
+
+    def handler(payload, publish):
+        payloads.append(payload)
+        if 'checkpoint' not in payload:
+            publish({'step': 'submitted'})
+            raise JobDeferred(0, {'batch_id': 'batch_1'})
+        publish({'step': 'collected'})
+
+    jobs = JobQueue(handler, path=str(tmp_path / 'jobs.sqlite3'), workers=1)
+    jobs.start()
+    job_id = jobs.enqueue({'name': 'Ada'})
+
+    job = wait_for_status(jobs, job_id, 'done')
+
+    assert [payload.get('checkpoint') for payload in payloads] == [None, {'batch_id': 'batch_1'}]
+    assert [result['step'] for result in job['results']] == ['submitted', 'collected']
@@ -0,0 +1,44 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from app.services import request_scheduler
+from app.services.request_scheduler import RequestScheduler
+
+def http_error(status):
+    return HttpError(httplib2.Response({'status': status}), b'{}')
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(request_scheduler.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(RequestScheduler, 'backoff', staticmethod(lambda attempt: 0))
+    return RequestScheduler(max_retries=3)
+
+def failing(*errors):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+    return fn, calls
+
+def test_transient_errors_are_retried(scheduler):
+    fn, calls = failing(http_error(503), http_error(429))
+
+    assert scheduler.call('test', fn) == 'ok'
+    assert len(calls) == 3
+
+def test_non_idempotent_call_is_not_retried_after_server_error(scheduler):
+    fn, calls = failing(http_error(503))
+
+    with pytest.raises(HttpError):
+        scheduler.call('test', fn, idempotent=False)
+    assert len(calls) == 1
+
+def test_non_idempotent_call_is_retried_when_rate_limited(scheduler):
+    fn, calls = failing(http_error(429))
+
+    assert scheduler.call('test', fn, idempotent=False) == 'ok'
+    assert len(calls) == 2
@@ -0,0 +1,11 @@
+from app.services.skill_matcher import SkillIndex
+
+def test_dotted_skill_does_not_match_plain_word():
+    index = SkillIndex("Grew net revenue by 20%. Built Node.js services.")
+
+    assert index.match(['.NET', 'Node.js'])['matched'] == ['Node.js']
+
+def test_dotted_skill_matches_itself_and_its_abbreviation():
+    index = SkillIndex("Ten years of .NET, lately dotnet core.")
+
+    assert index.match(['.NET'])['skills']['.NET']['count'] == 2
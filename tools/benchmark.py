@@ -0,0 +1,376 @@
+"""
+Offline throughput benchmark for EmailController.process_emails. GmailService talks to an in-process
+fake mailbox and the OpenAI client is replaced by canned completions (the same ones
+mock_openai_server.py returns), both with configurable latency and error rates. Everything else,
+from the scheduler and cache to the PDF pool and email store, is the real code.
+
+    python tools/benchmark.py --sizes 10,100,1000,10000 --output bench.json
+    python tools/benchmark.py --emails recorded.jsonl --openai-latency 0.8 --openai-error-rate 0.02
+
+Each inbox size reports emails/sec, per-stage latency percentiles taken from the pipeline trace,
+the tracemalloc peak and the process max RSS as JSON, so results can be compared between versions.
+All canned resumes are identical, so after the first one the PDF is found by content hash.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import base64
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import tracemalloc
+import subprocess
+from types import SimpleNamespace
+
+import httpx
+import httplib2
+import openai
+from googleapiclient.errors import HttpError
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from mock_openai_server import _completion  # noqa: E402
+
+DEFAULT_SIZES = "10,100,1000,10000"
+PERCENTILES = (50, 90, 99)
+
+# Synthetic mail: clear recruiter outreach, bulk mail rejected locally, and ambiguous mail left to the LLM
+SYNTHETIC_KINDS = [
+    (0.5, "Recruiter <jane{i}@talent{d}.greenhouse.io>", "Hiring: Senior Python Engineer opportunity #{i}",
+     "Hi, I am a recruiter at Example Corp. We are hiring for a full-time position and your background "
+     "in Python and AWS stood out. The compensation is competitive. Would you be open to an interview?"),
+    (0.3, "Alex Smith <alex{i}@company{d}.com>", "Quick question #{i}",
+     "Hello, I came across your profile and wanted to ask whether you would consider a new opportunity "
+     "on our platform team. Happy to share details."),
+    (0.2, "Jobs <noreply{i}@alerts{d}.example.com>", "Job alert: 25 new jobs you may be interested in #{i}",
+     "Here is your weekly newsletter. Unsubscribe at any time.")
+]
+
+class FakeBackend:
+    """Latency and error injection shared by every call to one fake service."""
+
+    def __init__(self, latency, jitter, error_rate, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def round_trip(self):
+        with self._lock:
+            self.calls += 1
+            delay = self._random.gauss(self.latency, self.latency * self.jitter)
+        time.sleep(max(0.0, delay))
+
+    def fails(self):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    def stats(self):
+        return {'calls': self.calls, 'errors': self.errors}
+
+def _http_error(status=503):
+    return HttpError(httplib2.Response({'status': status}), b'{"error": {"message": "Injected by the benchmark"}}')
+
+class FakeRequest:
+    def __init__(self, backend, method_id, result):
+        self.backend = backend
+        self.methodId = method_id
+        self.result = result
+
+    def execute(self):
+        self.backend.round_trip()
+        if self.backend.fails():
+            raise _http_error()
+        return self.result()
+
+class FakeBatch:
+    """One round trip for the whole batch; each call inside it can fail on its own, like the real endpoint."""
+
+    def __init__(self, backend, callback):
+        self.backend = backend
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.backend.round_trip()
+        for request_id, request in self.requests:
+            if self.backend.fails():
+                self.callback(request_id, None, _http_error(429))
+            else:
+                self.callback(request_id, request.result(), None)
+
+class FakeGmail:
+    """Stand-in for the object GmailService.get_service() returns, over a list of Gmail API message resources."""
+
+    def __init__(self, messages, backend):
+        self.messages = messages
+        self.by_id = {message['id']: message for message in messages}
+        self.backend = backend
+
+    def users(self):
+        return SimpleNamespace(
+            getProfile=lambda userId: FakeRequest(self.backend, 'gmail.users.getProfile',
+                                                  lambda: {'historyId': str(len(self.messages))}),
+            history=lambda: SimpleNamespace(list=lambda **kwargs: FakeRequest(
+                self.backend, 'gmail.users.history.list', lambda: {'history': []})),
+            messages=lambda: SimpleNamespace(list=self._list, get=self._get)
+        )
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self.backend, callback)
+
+    def _list(self, userId, labelIds=None, q=None, maxResults=100, pageToken=None):
+        def result():
+            start = int(pageToken or 0)
+            page = {'messages': [{'id': message['id']} for message in self.messages[start:start + maxResults]]}
+            if start + maxResults < len(self.messages):
+                page['nextPageToken'] = str(start + maxResults)
+            return page
+        return FakeRequest(self.backend, 'gmail.users.messages.list', result)
+
+    def _get(self, userId, id, format='full'):
+        return FakeRequest(self.backend, 'gmail.users.messages.get', lambda: self.by_id[id])
+
+class FakeOpenAI:
+    """Stand-in for the OpenAI client: chat.completions.create returns canned completions, streamed or not."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.backend.round_trip()
+        if self.backend.fails():
+            request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+            raise openai.InternalServerError("Injected by the benchmark", response=httpx.Response(500, request=request),
+                                             body=None)
+        completion = _completion(kwargs)
+        if kwargs.get('stream'):
+            return self._chunks(completion, (kwargs.get('stream_options') or {}).get('include_usage'))
+        return ChatCompletion.model_validate(completion)
+
+    @staticmethod
+    def _chunks(completion, include_usage):
+        chunk = {'id': completion['id'], 'object': 'chat.completion.chunk', 'created': completion['created'],
+                 'model': completion['model']}
+        for word in completion['choices'][0]['message']['content'].split(' '):
+            yield ChatCompletionChunk.model_validate(
+                dict(chunk, choices=[{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}])
+            )
+        if include_usage:
+            yield ChatCompletionChunk.model_validate(dict(chunk, choices=[], usage=completion['usage']))
+
+def _message(index, sender, subject, body, bulk=False):
+    headers = [{'name': 'From', 'value': sender}, {'name': 'Subject', 'value': subject}]
+    if bulk:
+        headers.append({'name': 'List-Unsubscribe', 'value': '<mailto:unsubscribe@example.com>'})
+    return {
+        'id': f"bench{index:06d}",
+        'threadId': f"bench{index:06d}",
+        'internalDate': str(1700000000000 - index * 1000),
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': headers,
+            'body': {'data': base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')}
+        }
+    }
+
+def synthetic_messages(size, seed):
+    rng = random.Random(seed)
+    weights = [kind[0] for kind in SYNTHETIC_KINDS]
+    messages = []
+    for index in range(size):
+        kind = rng.choices(range(len(SYNTHETIC_KINDS)), weights)[0]
+        _, sender, subject, body = SYNTHETIC_KINDS[kind]
+        values = {'i': index, 'd': index % 50}
+        messages.append(_message(index, sender.format(**values), subject.format(**values), body,
+                                 bulk=kind == len(SYNTHETIC_KINDS) - 1))
+    return messages
+
+def recorded_messages(path, size):
+    """Replay emails from a JSON list or JSONL file of {"from", "subject", "body"}, repeated up to size."""
+    with open(path, encoding='utf-8') as recorded_file:
+        text = recorded_file.read()
+    records = json.loads(text) if text.lstrip().startswith('[') else [json.loads(line) for line in text.splitlines()
+                                                                       if line.strip()]
+    if not records:
+        raise ValueError(f"No emails in {path}")
+    messages = []
+    for index in range(size):
+        record = records[index % len(records)]
+        messages.append(_message(index, record.get('from') or record.get('sender', ''), record.get('subject', ''),
+                                 record.get('body', ''), bulk=record.get('bulk', False)))
+    return messages
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+def stage_latencies(spans):
+    durations = {}
+    for span in spans:
+        durations.setdefault(span['stage'], []).append(span['duration'])
+    stages = {}
+    for stage, values in sorted(durations.items()):
+        values.sort()
+        stages[stage] = {
+            'count': len(values),
+            'total': round(sum(values), 6),
+            **{f'p{pct}': percentile(values, pct) for pct in PERCENTILES},
+            'max': values[-1]
+        }
+    return stages
+
+def max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_size(size, args, workdir):
+    from app.controllers.email_controller import EmailController
+    from app.services import openai_service
+    from app.services.email_store import EmailStore
+    from app.services.llm_cache import get_llm_cache
+    from app.services.metrics import get_metrics
+    from app.models.email_model import UserProfile
+
+    messages = recorded_messages(args.emails, size) if args.emails else synthetic_messages(size, args.seed)
+    gmail_backend = FakeBackend(args.gmail_latency, args.jitter, args.gmail_error_rate, args.seed)
+    openai_backend = FakeBackend(args.openai_latency, args.jitter, args.openai_error_rate, args.seed + 1)
+    fake_openai = FakeOpenAI(openai_backend)
+
+    controller = EmailController(max_workers=args.workers, incremental_sync=args.incremental,
+                                 stream_output=args.stream, max_emails=size)
+    controller.email_store = EmailStore(os.path.join(workdir, f"emails_{size}.sqlite3"))
+    controller.gmail_service.service = FakeGmail(messages, gmail_backend)
+    controller.gmail_service.openai_client = fake_openai
+    openai_service.client = fake_openai
+    get_llm_cache().clear()
+
+    user_profile = UserProfile("Bench User", "bench@example.com",
+                               "Bench User\n\nSkills\n\nPython, AWS, Go, Docker, Kubernetes, PostgreSQL\n\n"
+                               "Experience\n\nSenior engineer building data pipelines and web services.")
+    on_stream = (lambda email, stream_id, skill_match: None) if args.stream else None
+    metrics = get_metrics()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with metrics.trace(f"benchmark-{size}-{time.time_ns()}") as trace_id:
+        processed_emails = controller.process_emails(user_profile, on_stream=on_stream)
+    elapsed = time.perf_counter() - start
+    peak_memory = None
+    if args.tracemalloc:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'inbox_size': size,
+        'processed': len(processed_emails),
+        'seconds': round(elapsed, 6),
+        'emails_per_second': round(size / elapsed, 3) if elapsed else None,
+        'processed_per_second': round(len(processed_emails) / elapsed, 3) if elapsed else None,
+        'peak_memory_bytes': peak_memory,
+        'max_rss_bytes': max_rss_bytes(),
+        'gmail': gmail_backend.stats(),
+        'openai': openai_backend.stats(),
+        'classifier': dict(controller.gmail_service.classifier.stats),
+        'stages': stage_latencies(metrics.get_trace(trace_id)['spans'])
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for EmailController.process_emails")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma-separated inbox sizes (default %(default)s)")
+    parser.add_argument('--emails', help="JSON or JSONL file of recorded emails to replay instead of synthetic ones")
+    parser.add_argument('--gmail-latency', type=float, default=0.01, help="seconds per Gmail round trip")
+    parser.add_argument('--openai-latency', type=float, default=0.02, help="seconds per OpenAI completion")
+    parser.add_argument('--jitter', type=float, default=0.2, help="latency standard deviation as a share of the mean")
+    parser.add_argument('--gmail-error-rate', type=float, default=0.0, help="share of Gmail calls that fail")
+    parser.add_argument('--openai-error-rate', type=float, default=0.0, help="share of OpenAI calls that fail")
+    parser.add_argument('--workers', type=int, default=4, help="EmailController worker threads")
+    parser.add_argument('--incremental', action='store_true', help="use the incremental sync path")
+    parser.add_argument('--stream', action='store_true', help="stream completions through the StreamHub")
+    parser.add_argument('--openai-rpm', type=int, default=1000000, help="scheduler limit per model; default unthrottled")
+    parser.add_argument('--gmail-quota', type=int, default=1000000, help="scheduler Gmail quota units per second")
+    parser.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false',
+                        help="skip peak memory tracking, which slows the run down")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--verbose', action='store_true', help="show the application's log output")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    # Settings read when the app modules are imported; nothing may touch the real cache, stores or job queue
+    workdir = tempfile.mkdtemp(prefix="benchmark_")
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    os.environ['OPENAI_REQUESTS_PER_MINUTE'] = str(args.openai_rpm)
+    os.environ['GMAIL_QUOTA_UNITS_PER_SECOND'] = str(args.gmail_quota)
+    os.environ['PIPELINE_TRACING'] = '1'
+    os.environ['LLM_CACHE_PATH'] = os.path.join(workdir, 'llm_cache.sqlite3')
+    os.environ['JOB_DB_PATH'] = os.path.join(workdir, 'jobs.sqlite3')
+    os.environ['EMAIL_STORE_PATH'] = os.path.join(workdir, 'emails.sqlite3')
+    os.chdir(REPO_ROOT)
+
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+
+    from app.services.pdf_service import get_pdf_renderer
+    renderer = get_pdf_renderer()
+    renderer.output_dir = workdir
+    # Start the PDF worker processes now so the first inbox size does not pay for their start-up
+    renderer.render("<p>warm-up</p>", "warm-up")
+
+    runs = []
+    try:
+        for size in sizes:
+            print(f"Processing an inbox of {size} emails...", file=sys.stderr)
+            runs.append(run_size(size, args, workdir))
+            print(f"  {runs[-1]['emails_per_second']} emails/s, {runs[-1]['processed']} processed", file=sys.stderr)
+    finally:
+        renderer.shutdown()
+
+    config = vars(args).copy()
+    config['sizes'] = sizes
+    results = {
+        'benchmark': 'process_emails',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': config,
+        'runs': runs
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    return results
+
+if __name__ == '__main__':
+    main()
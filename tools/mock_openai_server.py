@@ -0,0 +1,171 @@
+"""
+Local stand-in for the parts of the OpenAI API the app uses: chat completions (streamed or not), file
+upload/download and the Batch API. Batches complete as soon as they are created, or after --batch-polls
+status checks.
+
+    python tools/mock_openai_server.py --port 8001 --batch-polls 2
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock flask run
+"""
+import re
+import json
+import time
+import uuid
+import argparse
+from flask import Flask, request, jsonify, Response
+
+app = Flask(__name__)
+files = {}
+batches = {}
+# Status checks a new batch answers with in_progress before it completes
+BATCH_POLLS = 0
+
+MOCK_RESUME = "# Tailored Resume\n\n## Summary\n\nExperienced engineer.\n\n## Skills\n\n- Python\n- AWS\n"
+MOCK_RESPONSE = "Thank you for reaching out. I am very interested in this role and have attached my resume."
+
+def _completion(body):
+    prompt = body['messages'][-1]['content'] if body.get('messages') else ''
+    if body.get('response_format', {}).get('type') == 'json_schema':
+        content = json.dumps({
+            'is_recruiter': True,
+            'job_description': 'Mock job description.',
+            'company_info': 'Mock company.',
+            'key_requirements': ['5+ years of experience'],
+            'required_skills': ['Python', 'AWS']
+        })
+    elif 'resume' in prompt.lower() and 'Markdown' in prompt:
+        content = MOCK_RESUME
+    elif 'True' in prompt and 'False' in prompt:
+        content = 'True'
+    else:
+        content = MOCK_RESPONSE
+
+    prompt_tokens = sum(len(message.get('content', '')) for message in body.get('messages', [])) // 4
+    completion_tokens = len(content) // 4
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'gpt-4o'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content, 'refusal': None},
+            'finish_reason': 'stop'
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+    }
+
+def _file_object(file_id):
+    stored = files[file_id]
+    return {
+        'id': file_id,
+        'object': 'file',
+        'bytes': len(stored['content']),
+        'created_at': stored['created_at'],
+        'filename': stored['filename'],
+        'purpose': stored['purpose'],
+        'status': 'processed'
+    }
+
+def _store_file(content, filename, purpose):
+    file_id = f"file-{uuid.uuid4().hex}"
+    files[file_id] = {'content': content, 'filename': filename, 'purpose': purpose, 'created_at': int(time.time())}
+    return file_id
+
+def _stream(completion, include_usage=False):
+    """Send a completion as chat.completion.chunk events, one word at a time."""
+    content = completion['choices'][0]['message']['content']
+    chunk = {'id': completion['id'], 'object': 'chat.completion.chunk', 'created': completion['created'],
+             'model': completion['model']}
+    yield f"data: {json.dumps(dict(chunk, choices=[{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}]))}\n\n"
+    for word in re.findall(r'\S+\s*', content):
+        yield f"data: {json.dumps(dict(chunk, choices=[{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]))}\n\n"
+    yield f"data: {json.dumps(dict(chunk, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n"
+    if include_usage:
+        # Like the real API with stream_options.include_usage: a final chunk with no choices
+        yield f"data: {json.dumps(dict(chunk, choices=[], usage=completion['usage']))}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    body = request.get_json()
+    if body.get('stream'):
+        include_usage = (body.get('stream_options') or {}).get('include_usage', False)
+        return Response(_stream(_completion(body), include_usage), mimetype='text/event-stream')
+    return jsonify(_completion(body))
+
+@app.route('/v1/files', methods=['POST'])
+def create_file():
+    upload = request.files['file']
+    file_id = _store_file(upload.read(), upload.filename, request.form.get('purpose', 'batch'))
+    return jsonify(_file_object(file_id))
+
+@app.route('/v1/files/<file_id>/content')
+def file_content(file_id):
+    if file_id not in files:
+        return jsonify({'error': {'message': 'No such file'}}), 404
+    return Response(files[file_id]['content'], mimetype='application/octet-stream')
+
+@app.route('/v1/batches', methods=['POST'])
+def create_batch():
+    body = request.get_json()
+    if body['input_file_id'] not in files:
+        return jsonify({'error': {'message': 'No such file'}}), 404
+
+    lines = files[body['input_file_id']]['content'].decode('utf-8').splitlines()
+    output = []
+    for line in filter(None, lines):
+        item = json.loads(line)
+        output.append(json.dumps({
+            'id': f"batch_req_{uuid.uuid4().hex}",
+            'custom_id': item['custom_id'],
+            'response': {'status_code': 200, 'request_id': uuid.uuid4().hex, 'body': _completion(item['body'])},
+            'error': None
+        }))
+
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    now = int(time.time())
+    output_file_id = _store_file("\n".join(output).encode('utf-8'), f"{batch_id}_output.jsonl", 'batch_output')
+    batches[batch_id] = {
+        'id': batch_id,
+        'object': 'batch',
+        'endpoint': body['endpoint'],
+        'input_file_id': body['input_file_id'],
+        'completion_window': body['completion_window'],
+        'status': 'completed',
+        'output_file_id': output_file_id,
+        'created_at': now,
+        'completed_at': now,
+        'request_counts': {'total': len(output), 'completed': len(output), 'failed': 0},
+        'metadata': body.get('metadata')
+    }
+    if BATCH_POLLS:
+        batches[batch_id].update(status='in_progress', output_file_id=None, completed_at=None,
+                                 _polls_left=BATCH_POLLS, _output_file_id=output_file_id)
+    return jsonify(_batch_object(batch_id))
+
+def _batch_object(batch_id):
+    return {key: value for key, value in batches[batch_id].items() if not key.startswith('_')}
+
+@app.route('/v1/batches/<batch_id>')
+def retrieve_batch(batch_id):
+    if batch_id not in batches:
+        return jsonify({'error': {'message': 'No such batch'}}), 404
+    batch = batches[batch_id]
+    if batch['status'] == 'in_progress':
+        if batch['_polls_left'] > 0:
+            batch['_polls_left'] -= 1
+        else:
+            batch.update(status='completed', output_file_id=batch['_output_file_id'], completed_at=int(time.time()))
+    return jsonify(_batch_object(batch_id))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mock OpenAI API for offline runs")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--batch-polls', type=int, default=0, help="Status checks before a batch completes")
+    args = parser.parse_args()
+    BATCH_POLLS = args.batch_polls
+    app.run(port=args.port, threaded=True)